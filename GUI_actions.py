@@ -1,5 +1,8 @@
 # GUI actions for Theia_lensIQ_GUI.py
 #
+# v.1.0.4 261019 added jog buttons and liveFrameEnabled flag
+# v.1.0.3 261019 added macro buttons
+# v.1.0.2 261019 added preset bar components
 # v.1.0.1 250812 removed MCR references
 # v.1.0.0 250811 extracted from Theia_lensIQ_GUI.py v.2.5.7
 
@@ -22,6 +25,7 @@ class GUIActions:
         self.gui = gui
 
         self.absMoveInitialized = False  # Flag to check if absolute movement is initialized
+        self.liveFrameEnabled = False    # Flag to check if the live frame (motor moves) is enabled
         self.regardBacklash = False
         self.regardLimits = False
         self.readyStatus = 'notInit'
@@ -37,16 +41,19 @@ class GUIActions:
         - absMoveInit: set if relativeOnly is False
         '''
         self.absMoveInitialized = absoluteInit
+        self.liveFrameEnabled = enable
 
         # relative movement buttons
         componentList = ['moveTeleBtn', 'moveWideBtn', 'moveNearBtn', 'moveFarBtn', 'moveOpenBtn', 'moveCloseBtn', \
-            'zoomCurFld', 'focusCurFld', 'irisCurFld', 'zoomStepFld', 'focusStepFld', 'irisStepFld', 'IRCBtn1', 'IRCBtn2']
+            'zoomCurFld', 'focusCurFld', 'irisCurFld', 'zoomStepFld', 'focusStepFld', 'irisStepFld', 'IRCBtn1', 'IRCBtn2', \
+            'presetCombo', 'presetDeleteBtn', 'macroRecordBtn', 'macroPlayBtn', \
+            'jogZoomMinus', 'jogZoomPlus', 'jogFocusMinus', 'jogFocusPlus', 'jogIrisMinus', 'jogIrisPlus']
         for component in componentList:
             self.gui.window[component].update(disabled = not enable)
         
         # absolute movement buttons
         if absoluteInit:
-            componentList = ['moveZoomAbsBtn', 'moveFocusAbsBtn', 'moveIrisAbsBtn']
+            componentList = ['moveZoomAbsBtn', 'moveFocusAbsBtn', 'moveIrisAbsBtn', 'presetRecallBtn', 'presetSaveBtn']
             for component in componentList:
                 self.gui.window[component].update(disabled = not enable)
         return
@@ -58,7 +65,7 @@ class GUIActions:
         ### input
         - enable (bool): state
         '''
-        componentList = ['moveZoomAbsBtn', 'moveFocusAbsBtn', 'moveIrisAbsBtn']
+        componentList = ['moveZoomAbsBtn', 'moveFocusAbsBtn', 'moveIrisAbsBtn', 'presetRecallBtn', 'presetSaveBtn']
         for component in componentList:
             self.gui.window[component].update(disabled = not enable)
         return
@@ -1,5 +1,9 @@
 # GUI window creation for Theia_lensIQ_GUI
 #
+# v.1.0.4 261019 added jog buttons and key/mouse wheel bindings
+# v.1.0.3 261019 added position plot button
+# v.1.0.2 261019 added macro record/play buttons
+# v.1.0.1 261019 added preset bar
 # v.1.0.0 250811 initial creation extracted from v.2.5.7 Theia_lensIQ_GUI.py
 
 from PSG_license import PySimpleGUI_License
@@ -55,6 +59,7 @@ class LensIQGUI:
                 sg.Text('', size=(20,1), font='Helvetica 8', key='fldFWRev'),
                 sg.Text('', size=(20,1), font='Helvetica 8', key='fldSNBoard'),
                 sg.Push(), 
+                sg.Button('Position plot', size=(12,1), key='telemetryBtn'),
                 sg.Image(filename=self.settingsIconPath, key='settingsPopup', enable_events=True),
                 sg.Button('Quit', size=(12,1), key="exitBtn")]
         ]
@@ -102,6 +107,20 @@ class LensIQGUI:
             [sg.Button('Focus', size=(12,1), key='moveFocusAbsBtn', disabled=True)],
             [sg.Button('Iris', size=(12,1), key='moveIrisAbsBtn', disabled=True)],
             ]
+        jogFrame = [
+            [sg.Button('<<', size=(3,1), key='jogZoomMinus', tooltip='Hold to jog tele (Ctrl+Left)'), sg.Button('>>', size=(3,1), key='jogZoomPlus', tooltip='Hold to jog wide (Ctrl+Right)')],
+            [sg.Button('<<', size=(3,1), key='jogFocusMinus', tooltip='Hold to jog near (Ctrl+Down)'), sg.Button('>>', size=(3,1), key='jogFocusPlus', tooltip='Hold to jog far (Ctrl+Up)')],
+            [sg.Button('<<', size=(3,1), key='jogIrisMinus', tooltip='Hold to jog open (Ctrl+PgUp)'), sg.Button('>>', size=(3,1), key='jogIrisPlus', tooltip='Hold to jog close (Ctrl+PgDn)')],
+            ]
+        presetFrame = [
+            [sg.Combo([], size=(22,10), key='presetCombo'), 
+                sg.Button('Recall', size=(8,1), key='presetRecallBtn', disabled=True), 
+                sg.Button('Save', size=(8,1), key='presetSaveBtn', disabled=True), 
+                sg.Button('Delete', size=(8,1), key='presetDeleteBtn')]
+            ]
+        macroFrame = [
+            [sg.Button('Record', size=(8,1), key='macroRecordBtn'), sg.Button('Play', size=(8,1), key='macroPlayBtn')]
+            ]
         IRCFrame = [
             [sg.Text('Internal filter:', size=(12,1)), sg.Button('Filter 1\n(Visible)', size=(11,2), key='IRCBtn1'), sg.Button('Filter 2\n(Visible + IR)', size=(11,2), key='IRCBtn2')]
         ]
@@ -111,7 +130,8 @@ class LensIQGUI:
             lensIQTopFrame, lensIQBottomFrame = self.IQFunctions.lensIQGUILayout()
             liveControlFrame.append([sg.Frame('IQ Lens™', lensIQTopFrame, expand_x=True)])
             liveControlFrame.append([sg.Frame('', lensIQBottomFrame, expand_x=True)])
-        liveControlFrame.append([sg.Frame('Relative move', relMoveFrame), sg.Frame('Current', curPosFrame), sg.Frame('Absolute move', absMoveFrame)])
+        liveControlFrame.append([sg.Frame('Relative move', relMoveFrame), sg.Frame('Current', curPosFrame), sg.Frame('Absolute move', absMoveFrame), sg.Frame('Jog', jogFrame)])
+        liveControlFrame.append([sg.Frame('Presets', presetFrame, expand_x=True), sg.Frame('Macro', macroFrame)])
         liveControlFrame.append([sg.Column(IRCFrame)])
         liveControlFrame.append([sg.Frame(title='', layout=footerFrame, expand_x=True)])
                     
@@ -126,6 +146,16 @@ class LensIQGUI:
         self.window['zoomCurFld'].bind('<Return>', 'Update')
         self.window['focusCurFld'].bind('<Return>', 'Update')
         self.window['irisCurFld'].bind('<Return>', 'Update')
+        # jog bindings: press and hold buttons, Ctrl + arrow/page keys, mouse wheel over the current position fields
+        for key in ['jogZoomMinus', 'jogZoomPlus', 'jogFocusMinus', 'jogFocusPlus', 'jogIrisMinus', 'jogIrisPlus']:
+            self.window[key].bind('<ButtonPress-1>', 'Press')
+            self.window[key].bind('<ButtonRelease-1>', 'Release')
+        for key in ['Left', 'Right', 'Up', 'Down', 'Prior', 'Next']:
+            self.window.bind(f'<Control-KeyPress-{key}>', f'jogKeyPress{key}')
+            self.window.bind(f'<KeyRelease-{key}>', f'jogKeyRelease{key}')
+        for key in ['zoomCurFld', 'focusCurFld', 'irisCurFld']:
+            self.window[key].bind('<MouseWheel>', 'Wheel')
+        self.window.bind('<FocusOut>', 'jogFocusOut')
         return self.window
 
     # setting window 
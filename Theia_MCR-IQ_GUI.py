@@ -11,6 +11,14 @@ import utilities
 import GUI_setup
 import read_settings_files as settingsFiles
 import GUI_actions
+import position_feed
+import command_pipeline
+import position_presets
+import macro_recorder
+import event_dispatcher
+import position_telemetry
+import telemetry_plot
+import jog_control
 
 # lensIQ imports
 ENABLE_LENS_IQ_FUNCTIONS = False
@@ -19,17 +27,26 @@ if ENABLE_LENS_IQ_FUNCTIONS: import lensIQ_expansion
 # global variable
 MCR = None
 mainGUI = None
+positionFeed = None
+boardSN = ''
+sourceWindow = None
+telemetryPlot = None
+positionsChanged = False        # a move was published since the last 'ready' record
+EXIT_APP = 'exitApp'            # handler return value to close the application
 
 # logging setup
 log = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG, format='%(levelname)-7s ln:%(lineno)-4d %(module)-18s  %(message)s')
 # set TheiaMCR sub module log level
 MCRDebugLogLevel = False
+# send independent initialization commands back-to-back (see command_pipeline.py)
+PIPELINE_SERIAL_COMMANDS = True
 
 settingsFileName = 'Motor control config.json'
 settingsIconPath = utilities.resourcePath('data/cog.png')    # location of the gear icon for settings
 lensDataFileName = 'limits.json'                   # lens data (names and extents)
 dataSetQRCode = utilities.resourcePath('data/QR-Dropbox-lensIQ-dataset.png')    # QR code for the lens data file
+telemetryCapacity = 100000                          # number of moves kept in the position history
 
 
 # create the main window GUI layout
@@ -105,7 +122,7 @@ def initMCR(MCRCom:str, lensFam:str='', homeMotors:bool=True, regardLimits:bool=
     ### return: 
     [initialized state]
     '''
-    global MCR
+    global MCR, boardSN
     actions.setStatus('init')
     if lensFam != '':
         # initialize configuration
@@ -116,15 +133,30 @@ def initMCR(MCRCom:str, lensFam:str='', homeMotors:bool=True, regardLimits:bool=
             log.error('** MCR initialization failed')
             MCR = None
             actions.setStatus('error')
+            publishPositions('error')
             return False
-        mainGUI.window['fldFWRev'].update(f'FW: {MCR.MCRBoard.readFWRevision()}')
-        mainGUI.window['fldSNBoard'].update(f'SN: {MCR.MCRBoard.readBoardSN()}')
+        FWRev, boardSN = '', ''
+        if PIPELINE_SERIAL_COMMANDS:
+            FWRev, boardSN = command_pipeline.readBoardInfo(command_pipeline.CommandPipeline(MCR.serialPort))
+            if FWRev == '' or boardSN == '': log.warning('Pipelined board info read failed, sending sequential commands')
+        if FWRev == '' or boardSN == '':
+            FWRev, boardSN = MCR.MCRBoard.readFWRevision(), MCR.MCRBoard.readBoardSN()
+        mainGUI.window['fldFWRev'].update(f'FW: {FWRev}')
+        mainGUI.window['fldSNBoard'].update(f'SN: {boardSN}')
     log.info('Initializing motors')
     MCR.focusInit(lensConfig[2], lensConfig[3], move=homeMotors)
     MCR.zoomInit(lensConfig[0], lensConfig[1], move=homeMotors)
     MCR.irisInit(lensConfig[4], move=homeMotors)
     MCR.IRCInit()
-    MCR.IRC.state(1)
+    pipelineSuccess = False
+    if PIPELINE_SERIAL_COMMANDS:
+        # IRC state and both limit flags in two round trips
+        pipelineSuccess = command_pipeline.setRegardLimitsAndIRC(command_pipeline.CommandPipeline(MCR.serialPort), MCR, regardLimits, IRCState=1)
+        if not pipelineSuccess: log.warning('Pipelined commands failed, sending sequential commands')
+    if not pipelineSuccess:
+        MCR.IRC.state(1)
+        MCR.focus.setRespectLimits(regardLimits)
+        MCR.zoom.setRespectLimits(regardLimits)
     mainGUI.window['IRCBtn1'].update(button_color=mainGUI.IRCSelectedColor)
     # set initial motor speeds
     setMotorSpeeds(settings.get('focusSpeed', 1000), settings.get('zoomSpeed', 1000), settings.get('irisSpeed', 100))
@@ -134,8 +166,6 @@ def initMCR(MCRCom:str, lensFam:str='', homeMotors:bool=True, regardLimits:bool=
 
     # initialize GUI settings
     actions.setRegardLimits(regardLimits)
-    MCR.focus.setRespectLimits(regardLimits)
-    MCR.zoom.setRespectLimits(regardLimits)
     actions.setRegardBacklash(True)
     actions.enableLiveFrame(True, absoluteInit=homeMotors)
 
@@ -146,10 +176,133 @@ def initMCR(MCRCom:str, lensFam:str='', homeMotors:bool=True, regardLimits:bool=
     mainGUI.window['zoomCurFld'].update(MCR.zoom.currentStep)
     mainGUI.window['irisCurFld'].update(MCR.iris.currentStep)
 
+    updatePresetList()
     actions.setStatus('ready')
+    publishPositions('ready')
     log.info('Lens initialized')
     return True
 
+# publish the motor positions to the shared memory feed
+def publishPositions(status:str):
+    '''
+    Write the current motor steps and controller status to the shared memory position feed for external processes. 
+    ### input: 
+    - status: controller status (see GUIActions.controllerStatusList)
+    '''
+    if not positionFeed:
+        return
+    if MCR and isinstance(MCR.zoom, TheiaMCR.MCRControl.motor):
+        positionFeed.publish(MCR.zoom.currentStep, MCR.focus.currentStep, MCR.iris.currentStep, status)
+    else:
+        positionFeed.publish(0, 0, 0, status)
+
+# publish the ready status after moves
+def publishReady():
+    '''
+    Publish a 'ready' record if a move was published since the last 'ready' record. 
+    '''
+    global positionsChanged
+    if positionsChanged:
+        positionsChanged = False
+        publishPositions('ready')
+
+# update the fields after a move
+def updateAfterMove(axis:str, target:int):
+    '''
+    Update the current position field and the lens IQ fields after a motor move. 
+    Add the move to the position history and publish the new position. 
+    ### input: 
+    - axis: 'zoom' | 'focus' | 'iris'
+    - target: the target step of the move
+    '''
+    global positionsChanged
+    positionsChanged = True
+    publishPositions('moving')
+    currentStep = getattr(MCR, axis).currentStep
+    mainGUI.window[f'{axis}CurFld'].update(currentStep)
+    telemetry.append(axis, target, currentStep)
+    if telemetryPlot: telemetryPlot.update()
+    if ENABLE_LENS_IQ_FUNCTIONS: 
+        if axis == 'zoom': IQEP.updateAfterZoom()
+        elif axis == 'focus': IQEP.updateAfterFocus(changeOD=False)
+        else: IQEP.updateAfterIris()
+
+# update the preset list for the lens and board
+def updatePresetList(selected:str=''):
+    '''
+    Fill the preset bar list with the presets saved for the current lens family and control board. 
+    ### input: 
+    - selected (optional: ''): preset name to show in the field
+    '''
+    mainGUI.window['presetCombo'].update(value=selected, values=presets.names(lastLensFamily, boardSN))
+
+# recall a preset
+def recallPreset(name:str):
+    '''
+    Move the motors to the preset positions.  Only the axes that are not already at the preset position are moved. 
+    All preset axes are recorded in a macro so the replay doesn't depend on the starting position. 
+    ### input: 
+    - name: preset name
+    '''
+    preset = presets.get(lastLensFamily, boardSN, name)
+    if preset == None:
+        log.warning(f'Preset "{name}" not found')
+        return
+    for axis in position_presets.PositionPresets.recallAxes:
+        recorder.record('abs', axis, preset[axis])
+    currentSteps = {'zoom': MCR.zoom.currentStep, 'focus': MCR.focus.currentStep, 'iris': MCR.iris.currentStep}
+    for axis, step in position_presets.PositionPresets.recallOrder(preset, currentSteps):
+        getattr(MCR, axis).moveAbs(step)
+        updateAfterMove(axis, step)
+
+# record or stop recording a macro
+def toggleMacroRecording():
+    '''
+    Start recording the motion events or stop recording and save the macro file.  
+    '''
+    if not recorder.recording:
+        recorder.start()
+        mainGUI.window['macroRecordBtn'].update('Stop')
+        return
+    ops = recorder.stop()
+    mainGUI.window['macroRecordBtn'].update('Record')
+    if len(ops) == 0:
+        return
+    fileName = sg.popup_get_file('Save macro', save_as=True, default_extension='.json', file_types=(('Macro', '*.json'),), no_window=True)
+    if fileName:
+        macro_recorder.saveMacro(fileName, ops)
+
+# replay a macro file
+def playMacro():
+    '''
+    Load a macro file and run it at full speed.  
+    '''
+    fileName = sg.popup_get_file('Open macro', file_types=(('Macro', '*.json'),), no_window=True)
+    if not fileName:
+        return
+    ops = macro_recorder.loadMacro(fileName)
+    if ops == None:
+        sg.popup_ok(f'Macro file format error: {fileName}', title='Error')
+        return
+    if not actions.absMoveInitialized and any(op[0] == 'abs' for op in ops):
+        sg.popup_ok('The macro has absolute moves, initialize and home the motors first', title='Error')
+        return
+
+    def afterOperation(kind:str, axis:str, value:int):
+        if kind == 'abs':
+            updateAfterMove(axis, value)
+        elif kind == 'rel':
+            updateAfterMove(axis, startSteps[axis] + value)
+        if kind in macro_recorder.MOVE_KINDS:
+            startSteps[axis] = getattr(MCR, axis).currentStep
+        elif kind == 'irc':
+            mainGUI.window['IRCBtn1'].update(button_color=mainGUI.IRCSelectedColor if value == 1 else mainGUI.TheiaDarkBlueColor)
+            mainGUI.window['IRCBtn2'].update(button_color=mainGUI.IRCSelectedColor if value == 2 else mainGUI.TheiaDarkBlueColor)
+        mainGUI.window.refresh()
+    startSteps = {axis: getattr(MCR, axis).currentStep for axis in macro_recorder.AXES}
+    replayer = macro_recorder.MacroReplayer(MCR, regardBacklash=actions.regardBacklash, afterOperation=afterOperation)
+    replayer.run(ops)
+
 # set motor speeds
 def setMotorSpeeds(focusSpeed:int=1000, zoomSpeed:int=1000, irisSpeed:int=100):
     '''
@@ -161,16 +314,19 @@ def setMotorSpeeds(focusSpeed:int=1000, zoomSpeed:int=1000, irisSpeed:int=100):
     '''
     if (MCR.focus.setMotorSpeed(int(focusSpeed)) == 0): 
         settings['focusSpeed'] = int(focusSpeed)
+        recorder.record('speed', 'focus', focusSpeed)
     else:
         log.warning(f'Focus motor speed {focusSpeed} is out of range, not changed')
 
     if (MCR.zoom.setMotorSpeed(int(zoomSpeed)) == 0): 
         settings['zoomSpeed'] = int(zoomSpeed)
+        recorder.record('speed', 'zoom', zoomSpeed)
     else:
         log.warning(f'Zoom motor speed {zoomSpeed} is out of range, not changed')
 
     if (MCR.iris.setMotorSpeed(int(irisSpeed)) == 0): 
         settings['irisSpeed'] = int(irisSpeed)
+        recorder.record('speed', 'iris', irisSpeed)
     else:
         log.warning(f'Iris motor speed {irisSpeed} is out of range, not changed')
     return
@@ -186,16 +342,19 @@ def setHomeSpeeds(focusSpeed:int=1000, zoomSpeed:int=1000, irisSpeed:int=100):
     '''
     if (MCR.focus.setHomingSpeed(int(focusSpeed)) == 0): 
         settings['focusHomingSpeed'] = int(focusSpeed)
+        recorder.record('homeSpeed', 'focus', focusSpeed)
     else:
         log.warning(f'Focus motor speed {focusSpeed} is out of range, not changed')
 
     if (MCR.zoom.setHomingSpeed(int(zoomSpeed)) == 0): 
         settings['zoomHomingSpeed'] = int(zoomSpeed)
+        recorder.record('homeSpeed', 'zoom', zoomSpeed)
     else:
         log.warning(f'Zoom motor speed {zoomSpeed} is out of range, not changed')
 
     if (MCR.iris.setHomingSpeed(int(irisSpeed)) == 0): 
         settings['irisHomingSpeed'] = int(irisSpeed)
+        recorder.record('homeSpeed', 'iris', irisSpeed)
     else:
         log.warning(f'Iris motor speed {irisSpeed} is out of range, not changed')
     return
@@ -227,6 +386,303 @@ def handleSettingsValues(values:dict):
     if values['cp_backlash'] != None:
         actions.setRegardBacklash(values['cp_backlash'])
 
+##################################################
+### main window event handlers
+### handler(event, values) is called by the event dispatcher.  Return EXIT_APP to close the application. 
+##################################################
+# set a new lens family
+def setLensFamily(newLensFamily:str|None):
+    global lastLensFamily
+    newLensFamily = checkNewLensFamily(newLensFamily)
+    if newLensFamily == None: 
+        return False
+    lastLensFamily = newLensFamily
+    settings['lastLensFamily'] = lastLensFamily
+    updatePresetList()
+    return True
+
+def onLensFamily(event, values):
+    if setLensFamily(values['cp_lensFam']):
+        if ENABLE_LENS_IQ_FUNCTIONS: mainGUI.window['calFile'].update('')
+
+def onComPort(event, values):
+    global comPort
+    newComPort = values['cp_port']
+    if newComPort != comPort:
+        comPort = newComPort
+        settings['comPort'] = comPort
+        # cancel motor initialization status
+        actions.setStatus('notInit')
+        actions.enableLiveFrame(False)
+
+def onComPortRefresh(event, values):
+    global comPort
+    newComPortList = utilities.searchComPorts()
+    if comPort not in newComPortList:
+        # previously selected comPort no longer available, choose the last one in the new list
+        comPort = newComPortList[-1] if len(newComPortList) >= 1 else ''
+        if comPort != '':
+            settings['comPort'] = comPort
+        # cancel motor initialization status
+        actions.setStatus('notInit')
+        actions.enableLiveFrame(False)
+    mainGUI.window['cp_port'].update(value=comPort, values=sorted(newComPortList), size=(18,10))
+
+def onMotorInit(event, values):
+    if comPort != '':
+        initMCR(MCRCom=comPort, homeMotors=False, lensFam=lastLensFamily, regardLimits=False)
+    else:
+        log.error("** Com port is blank")
+        sg.popup_ok('Com port is blank', title='Error')
+
+def onMotorInitHome(event, values):
+    if comPort != '':
+        success = initMCR(lensFam=lastLensFamily, MCRCom=comPort, homeMotors=True, regardLimits=True)
+        if success and MCR.MCRInitialized and ENABLE_LENS_IQ_FUNCTIONS: IQEP.updateCalibrationFile()
+    else:
+        log.error("** Com port is blank")
+        sg.popup_ok('Com port is blank', title='Error')
+
+def onSettings(event, values):
+    global MCR
+    # open the settings popup window.  The communication path for this program will always be 'USB'.  
+    settingsValues = mainGUI.settingsGUI('USB', MCR, actions)
+    if settingsValues == None:
+        return
+    handleSettingsValues(settingsValues)
+
+    if settingsValues['comUART'] or settingsValues['comI2C']:
+        # communications path was set to something else and USB is no longer available. 
+        if comPort == '':
+            log.error('** Com port is blank')
+            sg.popup_ok('Com path not changed: Com port is blank', title='Error')
+            return
+        if not MCR:
+            MCR = TheiaMCR.MCRControl(comPort)
+            if not MCR.MCRInitialized:
+                log.error('** Com path not changed: MCR not initialized')
+                sg.popup_ok('Motor control initalization error, communication path not changed', title='Error')
+                MCR = None
+                return
+        MCR.MCRBoard.setCommunicationPath('UART' if settingsValues['comUART'] else 'I2C')
+        sg.popup_ok(f'New communication path was set to {"UART" if settingsValues["comUART"] else "I2C"}.  USB communication is no longer available and this application will end.', title='New com path')
+        return EXIT_APP
+
+def onIRC(event, values):
+    state = macro_recorder.MacroRecorder.IRCEvents[event]
+    mainGUI.window['IRCBtn1'].update(button_color=mainGUI.IRCSelectedColor if state == 1 else mainGUI.TheiaDarkBlueColor)
+    mainGUI.window['IRCBtn2'].update(button_color=mainGUI.IRCSelectedColor if state == 2 else mainGUI.TheiaDarkBlueColor)
+    MCR.IRC.state(state)
+    recorder.record('irc', '', state)
+
+def onPresetSave(event, values):
+    # presets are only valid if the step positions are referenced to the PI (motors homed)
+    if not actions.absMoveInitialized:
+        return
+    name = values['presetCombo'].strip()
+    if name == '':
+        sg.popup_ok('Enter a preset name', title='Error')
+    else:
+        presets.save(lastLensFamily, boardSN, name, MCR.zoom.currentStep, MCR.focus.currentStep, MCR.iris.currentStep)
+        updatePresetList(name)
+
+def onPresetDelete(event, values):
+    if presets.delete(lastLensFamily, boardSN, values['presetCombo']):
+        updatePresetList()
+
+def onMacroRecord(event, values):
+    toggleMacroRecording()
+
+def onTelemetryPlot(event, values):
+    global telemetryPlot
+    if telemetryPlot:
+        telemetryPlot.window.bring_to_front()
+        return
+    _, lensConfig = selectLens(lastLensFamily)
+    telemetryPlot = telemetry_plot.TelemetryPlot(telemetry, {'zoom': lensConfig[0], 'focus': lensConfig[2], 'iris': lensConfig[4]})
+
+def onTelemetryExport(event, values):
+    telemetryPlot.export('npy' if event == 'telemetryExportNpy' else 'csv')
+
+# jog handlers
+def canJog() -> bool:
+    return bool(MCR and MCR.MCRInitialized and actions.liveFrameEnabled)
+
+def jogFinish(wait:bool=False):
+    '''
+    Update the fields after a jog move is finished.  Stop jogging if the motor is at a limit. 
+    ### input: 
+    - wait (optional: False): wait for the move in progress
+    '''
+    move = jog.finishedMove(wait)
+    if move == None:
+        return
+    axis, startStep, steps = move
+    endStep = getattr(MCR, axis).currentStep
+    updateAfterMove(axis, startStep + steps)
+    recorder.recordMove(axis, startStep, endStep)
+    if endStep == startStep and jog.axis == axis and jog.direction * steps > 0:
+        log.info(f'Jog {axis} stopped at limit')
+        jog.stop()
+    if not jog.active:
+        actions.setStatus('ready')
+        publishReady()
+
+def waitForJog():
+    '''
+    Stop jogging and wait for the jog move in progress (before sending other commands to the board). 
+    '''
+    jog.stop()
+    jogFinish(wait=True)
+
+def jogStep():
+    '''
+    Collect the finished jog move and send the next move if it is due.  Stop jogging if the live frame is disabled. 
+    '''
+    jogFinish()
+    if not jog.active or jog.busy:
+        return
+    if not canJog():
+        stopJog()
+        return
+    steps = jog.dueSteps(getattr(MCR, jog.axis).currentSpeed)
+    if steps != 0:
+        jog.send(getattr(MCR, jog.axis), jog.axis, steps)
+
+def startJog(axis:str, direction:int):
+    if canJog() and jog.start(axis, direction):
+        actions.setStatus('moving')
+        jogStep()
+
+def stopJog():
+    # the status is set to ready when the move in progress is finished
+    if jog.stop() and not jog.busy:
+        actions.setStatus('ready')
+        publishReady()
+
+def onJogButton(event, values):
+    if event.endswith('Press'):
+        startJog(*jog_control.JogController.buttonEvents[event.removesuffix('Press')])
+    else:
+        stopJog()
+
+def onJogKeyPress(event, values):
+    startJog(*jog_control.JogController.keyEvents[event.removeprefix('jogKeyPress')])
+
+def onJogKeyRelease(event, values):
+    axis, _ = jog_control.JogController.keyEvents[event.removeprefix('jogKeyRelease')]
+    if jog.axis == axis: stopJog()
+
+def onJogStop(event, values):
+    stopJog()
+
+def onJogWheel(event, values):
+    if not canJog() or jog.active or jog.busy:
+        return
+    axis = jog_control.JogController.wheelEvents[event]
+    delta = mainGUI.window[f'{axis}CurFld'].user_bind_event.delta
+    actions.setStatus('moving')
+    jog.send(getattr(MCR, axis), axis, jog.wheelSteps(delta, getattr(MCR, axis).currentSpeed))
+
+# motor move handlers
+def onMoveRelative(event, values):
+    axis, direction, stepField = macro_recorder.MacroRecorder.relativeEvents[event]
+    steps = direction * int(values[stepField])
+    startStep = getattr(MCR, axis).currentStep
+    # iris moves don't use backlash correction
+    getattr(MCR, axis).moveRel(steps, correctForBL=actions.regardBacklash if axis != 'iris' else False)
+    updateAfterMove(axis, startStep + steps)
+    recorder.recordMove(axis, startStep, getattr(MCR, axis).currentStep)
+
+def onMoveAbsolute(event, values):
+    if actions.absMoveInitialized:
+        axis, positionField = macro_recorder.MacroRecorder.absoluteEvents[event]
+        target = int(values[positionField])
+        startStep = getattr(MCR, axis).currentStep
+        # move to absolute position
+        getattr(MCR, axis).moveAbs(target)
+        # confirm update field
+        updateAfterMove(axis, target)
+        recorder.recordMove(axis, startStep, getattr(MCR, axis).currentStep, absolute=True)
+
+def onPresetRecall(event, values):
+    if actions.absMoveInitialized:
+        recallPreset(values['presetCombo'])
+
+def onMacroPlay(event, values):
+    if recorder.recording:
+        sg.popup_ok('Stop the macro recording first', title='Error')
+    else:
+        playMacro()
+
+def moveHandler(handler):
+    '''
+    Wrap a move handler to check the MCR state and set the controller status while moving. 
+    '''
+    def move(event, values):
+        global positionsChanged
+        if not (MCR and MCR.MCRInitialized):
+            return
+        actions.setStatus('moving')
+        positionsChanged = True
+        publishPositions('moving')
+        handler(event, values)
+    move.__name__ = handler.__name__
+    return move
+
+# lens IQ expansion handlers
+def lensIQHandler(handler):
+    '''
+    Wrap a lensIQ expansion handler.  The handler returns a new lens family name or None.  
+    '''
+    def IQHandler(event, values):
+        lensFamily = handler(sourceWindow == mainGUI.window, event, values)
+        if setLensFamily(lensFamily): 
+            mainGUI.window['cp_lensFam'].update(lastLensFamily)
+    IQHandler.__name__ = handler.__name__
+    return IQHandler
+
+def registerEventHandlers() -> bool:
+    '''
+    Fill the event dispatcher table. 
+    ### return: 
+    [True if the lens IQ expansion registered its own handlers (otherwise it is polled for every event)]
+    '''
+    dispatcher.register('cp_lensFam', onLensFamily)
+    dispatcher.register('cp_port', onComPort)
+    dispatcher.register('cp_refresh', onComPortRefresh)
+    dispatcher.register('motorInitBtn', onMotorInit)
+    dispatcher.register('motorInitHomeBtn', onMotorInitHome)
+    dispatcher.register('settingsPopup', onSettings)
+    dispatcher.register('IRCBtn1', onIRC)
+    dispatcher.register('IRCBtn2', onIRC)
+    dispatcher.register('presetSaveBtn', onPresetSave)
+    dispatcher.register('presetDeleteBtn', onPresetDelete)
+    dispatcher.register('macroRecordBtn', onMacroRecord)
+    dispatcher.register('telemetryBtn', onTelemetryPlot)
+    for key in jog_control.JogController.buttonEvents:
+        dispatcher.register(f'{key}Press', onJogButton)
+        dispatcher.register(f'{key}Release', onJogButton)
+    dispatcher.register('jogKeyPress', onJogKeyPress, prefix=True)
+    dispatcher.register('jogKeyRelease', onJogKeyRelease, prefix=True)
+    dispatcher.register('jogFocusOut', onJogStop)
+    for event in jog_control.JogController.wheelEvents:
+        dispatcher.register(event, onJogWheel)
+    dispatcher.register('telemetryExportNpy', onTelemetryExport)
+    dispatcher.register('telemetryExportCSV', onTelemetryExport)
+    for event in macro_recorder.MacroRecorder.relativeEvents:
+        dispatcher.register(event, moveHandler(onMoveRelative))
+    for event in macro_recorder.MacroRecorder.absoluteEvents:
+        dispatcher.register(event, moveHandler(onMoveAbsolute))
+    dispatcher.register('presetRecallBtn', moveHandler(onPresetRecall))
+    dispatcher.register('macroPlayBtn', moveHandler(onMacroPlay))
+
+    if ENABLE_LENS_IQ_FUNCTIONS and hasattr(IQEP, 'registerHandlers'): 
+        # IQEP.registerHandlers(register) calls register(key, handler, prefix=False) for each of its events
+        IQEP.registerHandlers(lambda key, handler, prefix=False: dispatcher.register(key, lensIQHandler(handler), prefix=prefix))
+        return True
+    return False
+
 ##################################################
 ### main application routine 
 ##################################################
@@ -248,177 +704,64 @@ if lensData == None:
 lensFamiliesList = list(lensData.keys())
 lastLensFamily = settings.get('lastLensFamily', 'TL1250P Nx')
 slowHomeApproach = settings.get('slowHome', True)
+presets = position_presets.PositionPresets(settings)
+recorder = macro_recorder.MacroRecorder()
+telemetry = position_telemetry.TelemetryRingBuffer(telemetryCapacity)
+jog = jog_control.JogController()
 
 # create the GUI window
 actions = createMainGUI()
 
+# shared memory position feed for external processes
+try:
+    positionFeed = position_feed.PositionFeed(create=True)
+except OSError as e:
+    log.warning(f'Position feed not available ({e})')
+
 # Lens IQ setup variables
 if ENABLE_LENS_IQ_FUNCTIONS: IQEP.setup(mainGUI.window, settings, actions.setStatus)
 
+# event handler table
+dispatcher = event_dispatcher.EventDispatcher()
+lensIQRegistered = registerEventHandlers()
+if ENABLE_LENS_IQ_FUNCTIONS and not lensIQRegistered: lensIQPoll = lensIQHandler(IQEP.checkEvents)
+
 while (True):
-    sourceWindow, event, values = sg.read_all_windows()
+    sourceWindow, event, values = sg.read_all_windows(timeout=jog.timeout())
+    if event == sg.TIMEOUT_EVENT:
+        # next jog move
+        jogStep()
+        continue
+    if jog.busy and not jog_control.JogController.isJogEvent(event):
+        # finish the jog move before other commands are sent to the board
+        waitForJog()
     #log.debug(f"Event: {event}\n{values}")
     if event in (sg.WIN_CLOSED, 'exitBtn'):
         if sourceWindow == mainGUI.window:
             # close application
             break
+        elif telemetryPlot and sourceWindow == telemetryPlot.window:
+            telemetryPlot.close()
+            telemetryPlot = None
         else:
             IQEP.closeWindow(sourceWindow)
 
-    elif (event == 'cp_lensFam'):
-        newLensFamily = checkNewLensFamily(values['cp_lensFam'])
-        if newLensFamily != None: 
-            lastLensFamily = newLensFamily
-            settings['lastLensFamily'] = lastLensFamily
-            if ENABLE_LENS_IQ_FUNCTIONS: mainGUI.window['calFile'].update('')
-
-    elif event == 'cp_port':
-        newComPort = values['cp_port']
-        if newComPort != comPort:
-            comPort = newComPort
-            settings['comPort'] = comPort
-            # cancel motor initialization status
-            actions.setStatus('notInit')
-            actions.enableLiveFrame(False)
-
-    elif event == 'cp_refresh':
-        newComPortList = utilities.searchComPorts()
-        if comPort not in newComPortList:
-            # previously selected comPort no longer available, choose the last one in the new list
-            comPort = newComPortList[-1] if len(newComPortList) >= 1 else ''
-            if comPort != '':
-                settings['comPort'] = comPort
-            # cancel motor initialization status
-            actions.setStatus('notInit')
-            actions.enableLiveFrame(False)
-        mainGUI.window['cp_port'].update(value=comPort, values=sorted(newComPortList), size=(18,10))
-
-    elif event == 'motorInitBtn':
-        if comPort != '':
-            initMCR(MCRCom=comPort, homeMotors=False, lensFam=lastLensFamily, regardLimits=False)
-        else:
-            log.error("** Com port is blank")
-            sg.popup_ok('Com port is blank', title='Error')
-    
-    elif event == 'motorInitHomeBtn':
-        if comPort != '':
-            success = initMCR(lensFam=lastLensFamily, MCRCom=comPort, homeMotors=True, regardLimits=True)
-            if success and MCR.MCRInitialized and ENABLE_LENS_IQ_FUNCTIONS: IQEP.updateCalibrationFile()
-        else:
-            log.error("** Com port is blank")
-            sg.popup_ok('Com port is blank', title='Error')
-
-    elif event == 'settingsPopup':
-        # open the settings popup window.  The communication path for this program will always be 'USB'.  
-        settingsValues = mainGUI.settingsGUI('USB', MCR, actions)
-        if settingsValues != None:
-            handleSettingsValues(settingsValues)
-
-            if settingsValues['comUART'] or settingsValues['comI2C']:
-                # communications path was set to something else and USB is no longer available. 
-                if comPort == '':
-                    log.error('** Com port is blank')
-                    sg.popup_ok('Com path not changed: Com port is blank', title='Error')
-                    continue
-                if not MCR:
-                    MCR = TheiaMCR.MCRControl(comPort)
-                    if not MCR.MCRInitialized:
-                        log.error('** Com path not changed: MCR not initialized')
-                        sg.popup_ok('Motor control initalization error, communication path not changed', title='Error')
-                        MCR = None
-                        continue
-                MCR.MCRBoard.setCommunicationPath('UART' if settingsValues['comUART'] else 'I2C')
-                sg.popup_ok(f'New communication path was set to {"UART" if settingsValues["comUART"] else "I2C"}.  USB communication is no longer available and this application will end.', title='New com path')
-                break
-    
-    elif event == 'IRCBtn1':
-        mainGUI.window['IRCBtn1'].update(button_color=mainGUI.IRCSelectedColor)
-        mainGUI.window['IRCBtn2'].update(button_color=mainGUI.TheiaDarkBlueColor)
-        MCR.IRC.state(1)
-        
-    elif event == 'IRCBtn2':
-        mainGUI.window['IRCBtn1'].update(button_color=mainGUI.TheiaDarkBlueColor)
-        mainGUI.window['IRCBtn2'].update(button_color=mainGUI.IRCSelectedColor)
-        MCR.IRC.state(2)
+    if dispatcher.dispatch(event, values) == EXIT_APP:
+        break
 
-    if ENABLE_LENS_IQ_FUNCTIONS: 
-        lensFamily = IQEP.checkEvents(sourceWindow == mainGUI.window, event, values)
-        newLensFamily = checkNewLensFamily(lensFamily)
-        if newLensFamily != None: 
-            lastLensFamily = newLensFamily
-            settings['lastLensFamily'] = lastLensFamily
-            mainGUI.window['cp_lensFam'].update(lastLensFamily)
+    if ENABLE_LENS_IQ_FUNCTIONS and not lensIQRegistered: 
+        # lens IQ expansion without a handler table checks every event
+        lensIQPoll(event, values)
 
-    if MCR:
-        if MCR.MCRInitialized and event in {'moveWideBtn', 'moveTeleBtn', 'moveNearBtn', 'moveFarBtn', 'moveOpenBtn', 'moveCloseBtn', 'moveZoomAbsBtn', 'moveFocusAbsBtn', 'moveIrisAbsBtn', 'zoomCurFldUpdate', 'focusCurFldUpdate', 'irisCurFldUpdate'}:
-            actions.setStatus('moving')
-            if event == 'moveWideBtn':
-                # move zoom motor
-                MCR.zoom.moveRel(int(values['zoomStepFld']), correctForBL=actions.regardBacklash)
-                # update field
-                mainGUI.window['zoomCurFld'].update(MCR.zoom.currentStep)
-                if ENABLE_LENS_IQ_FUNCTIONS: IQEP.updateAfterZoom()
-
-            elif event == 'moveTeleBtn':
-                # move zoom motor
-                MCR.zoom.moveRel(-int(values['zoomStepFld']), correctForBL=actions.regardBacklash)
-                # update field
-                mainGUI.window['zoomCurFld'].update(MCR.zoom.currentStep)
-                if ENABLE_LENS_IQ_FUNCTIONS: IQEP.updateAfterZoom()
-
-            elif event == 'moveNearBtn':
-                # move focus motor
-                MCR.focus.moveRel(-int(values['focusStepFld']), correctForBL=actions.regardBacklash)
-                # update field
-                mainGUI.window['focusCurFld'].update(MCR.focus.currentStep)
-                if ENABLE_LENS_IQ_FUNCTIONS: IQEP.updateAfterFocus(changeOD=False)
-
-            elif event == 'moveFarBtn':
-                # move focus motor
-                MCR.focus.moveRel(int(values['focusStepFld']), correctForBL=actions.regardBacklash)
-                # updated field
-                mainGUI.window['focusCurFld'].update(MCR.focus.currentStep)
-                if ENABLE_LENS_IQ_FUNCTIONS: IQEP.updateAfterFocus(changeOD=False)
-
-            elif event == 'moveOpenBtn':
-                # move iris motor
-                MCR.iris.moveRel(-int(values['irisStepFld']), correctForBL=False)
-                # update field
-                mainGUI.window['irisCurFld'].update(MCR.iris.currentStep)
-                if ENABLE_LENS_IQ_FUNCTIONS: IQEP.updateAfterIris()
-
-            elif event == 'moveCloseBtn':
-                # move iris motor
-                MCR.iris.moveRel(int(values['irisStepFld']), correctForBL=False)
-                # updated field
-                mainGUI.window['irisCurFld'].update(MCR.iris.currentStep)
-                if ENABLE_LENS_IQ_FUNCTIONS: IQEP.updateAfterIris()
-
-            elif event in {'moveZoomAbsBtn', 'zoomCurFldUpdate'}:
-                if actions.absMoveInitialized:
-                    # move to absolute position
-                    MCR.zoom.moveAbs(int(values['zoomCurFld']))
-                    # confirm update field
-                    mainGUI.window['zoomCurFld'].update(MCR.zoom.currentStep)
-                    if ENABLE_LENS_IQ_FUNCTIONS: IQEP.updateAfterZoom()
-
-            elif event in {'moveFocusAbsBtn', 'focusCurFldUpdate'}:
-                if actions.absMoveInitialized:
-                    # move to absolute position
-                    MCR.focus.moveAbs(int(values['focusCurFld']))
-                    # confirm update field
-                    mainGUI.window['focusCurFld'].update(MCR.focus.currentStep)
-                    if ENABLE_LENS_IQ_FUNCTIONS: IQEP.updateAfterFocus(changeOD=False)
-
-            elif event in {'moveIrisAbsBtn', 'irisCurFldUpdate'}:
-                if actions.absMoveInitialized:
-                    # move to absolute position
-                    MCR.iris.moveAbs(int(values['irisCurFld']))
-                    # confirm update field
-                    mainGUI.window['irisCurFld'].update(MCR.iris.currentStep)
-                    if ENABLE_LENS_IQ_FUNCTIONS: IQEP.updateAfterIris()
-        
+    if jog.active or jog.busy:
+        jogStep()
+    elif MCR:
         ####### check for unknown position
         actions.setStatus('ready')
+        publishReady()
 
+jog.close()
+dispatcher.logStats()
+if telemetryPlot: telemetryPlot.close()
 mainGUI.window.close()
+if positionFeed: positionFeed.close()
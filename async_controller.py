@@ -0,0 +1,207 @@
+# Asyncio motor controller for embedding the MCR control in other applications
+#
+# v.1.0.0 261019 initial creation
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import TheiaMCR
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+class AsyncMCRController:
+    axes = ('zoom', 'focus', 'iris')
+
+    def __init__(self, serialPortName:str, timeout:float|None=None, moduleDebugLevel:bool=False):
+        '''
+        Await-able wrapper around TheiaMCR.MCRControl for one control board.
+        All board communication for this board runs on a dedicated single thread executor so the event loop is never
+        blocked and the commands are sent to the board in the order they were awaited.  Each board has its own
+        executor so several boards can be driven at the same time from one event loop:
+            await asyncio.gather(boardA.moveAbs('zoom', 3000), boardB.moveAbs('zoom', 3000))
+        Several boards need TheiaMCR 3.5 or later (per board initialization).  In earlier versions the class level
+        MCRInitialized flag stops a second board from opening.
+
+        Cancellation and timeouts: a command that hasn't started is removed from the executor queue.  A command
+        that is already running can't be interrupted (the serial exchange and the motor move finish on the board) so
+        the await ends with asyncio.CancelledError or TimeoutError and the positionUnknown flag is set.  The next
+        command waits for the running command to finish.
+        ### input:
+        - serialPortName: the board com port ('com4')
+        - timeout (optional: None): (s) default timeout for each operation.  None = no timeout
+        - moduleDebugLevel (optional: False): TheiaMCR module debug logging
+        ### instance variables:
+        - MCR: the MCRControl instance (None until init)
+        - positionUnknown: set if a move was cancelled or timed out before the step positions were updated
+        '''
+        self.serialPortName = serialPortName
+        self.timeout = timeout
+        self.moduleDebugLevel = moduleDebugLevel
+        self.MCR = None
+        self.positionUnknown = False
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'MCR_{serialPortName}')
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    # run a blocking function on the board executor
+    async def _run(self, func, *args, timeout:float|None=None, move:bool=False, **kwargs):
+        '''
+        Run a blocking TheiaMCR function on the board executor.
+        ### input:
+        - func: the blocking function
+        - args, kwargs: the function arguments
+        - timeout (optional: None): (s) timeout for this call (None = default timeout)
+        - move (optional: False): set the positionUnknown flag if the call doesn't complete
+        ### return:
+        [function return value]
+        '''
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+        try:
+            return await asyncio.wait_for(future, timeout if timeout != None else self.timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            if move: self.positionUnknown = True
+            log.warning(f'{self.serialPortName} {func.__name__} cancelled or timed out')
+            raise
+
+    def _checkInitialized(self):
+        if not self.MCR:
+            raise RuntimeError(f'{self.serialPortName} not initialized')
+
+    def _motor(self, axis:str):
+        if axis not in AsyncMCRController.axes:
+            raise ValueError(f'Unknown axis {axis}')
+        self._checkInitialized()
+        return getattr(self.MCR, axis)
+
+    ##### initialization #####
+    def _initBlocking(self, lensConfig:list, homeMotors:bool, regardLimits:bool) -> bool:
+        # same sequence as initMCR in the GUI application
+        if not self.MCR:
+            MCR = TheiaMCR.MCRControl(self.serialPortName, moduleDebugLevel=self.moduleDebugLevel)
+            if not getattr(MCR, 'boardInitialized', False):
+                log.error(f'** MCR initialization failed on {self.serialPortName}')
+                # release the serial port and the cached port instance so init can be retried
+                MCR.close()
+                return False
+            self.MCR = MCR
+        self.MCR.focusInit(lensConfig[2], lensConfig[3], move=homeMotors)
+        self.MCR.zoomInit(lensConfig[0], lensConfig[1], move=homeMotors)
+        self.MCR.irisInit(lensConfig[4], move=homeMotors)
+        self.MCR.IRCInit()
+        self.MCR.IRC.state(1)
+        self.MCR.focus.setRespectLimits(regardLimits)
+        self.MCR.zoom.setRespectLimits(regardLimits)
+        self.positionUnknown = not homeMotors
+        return True
+
+    async def init(self, lensConfig:list, homeMotors:bool=True, regardLimits:bool=True, timeout:float|None=None) -> bool:
+        '''
+        Open the board and initialize the motors.
+        ### input:
+        - lensConfig: [zoom steps, zoom PI, focus steps, focus PI, iris steps] (see selectLens in the GUI application)
+        - homeMotors (optional: True): move the motors to the home positions
+        - regardLimits (optional: True): regard the limit switches
+        - timeout (optional: None): (s) operation timeout
+        ### return:
+        [initialized state]
+        '''
+        return await self._run(self._initBlocking, lensConfig, homeMotors, regardLimits, timeout=timeout, move=True)
+
+    ##### motor moves #####
+    async def moveAbs(self, axis:str, step:int, timeout:float|None=None) -> int:
+        '''
+        Move a motor to an absolute step (homes the motor first).
+        ### input:
+        - axis: 'zoom' | 'focus' | 'iris'
+        - step: target step
+        - timeout (optional: None): (s) operation timeout
+        ### return:
+        [TheiaMCR error code (0 = OK)]
+        '''
+        error = await self._run(self._motor(axis).moveAbs, int(step), timeout=timeout, move=True)
+        if error == 0: self.positionUnknown = False
+        return error
+
+    async def moveRel(self, axis:str, steps:int, correctForBL:bool=True, timeout:float|None=None) -> int:
+        '''
+        Move a motor by a number of steps.
+        ### input:
+        - axis: 'zoom' | 'focus' | 'iris'
+        - steps: number of steps (+/-)
+        - correctForBL (optional: True): backlash correction
+        - timeout (optional: None): (s) operation timeout
+        ### return:
+        [TheiaMCR error code (0 = OK)]
+        '''
+        return await self._run(self._motor(axis).moveRel, int(steps), correctForBL=correctForBL, timeout=timeout, move=True)
+
+    async def home(self, axis:str, timeout:float|None=None) -> int:
+        '''
+        Move a motor to the home (PI) position.
+        ### return:
+        [TheiaMCR error code (0 = OK)]
+        '''
+        return await self._run(self._motor(axis).home, timeout=timeout, move=True)
+
+    ##### settings #####
+    async def setIRC(self, state:int, timeout:float|None=None) -> int:
+        '''
+        Set the IRC filter.
+        ### input:
+        - state: 1 (visible) | 2 (visible + IR)
+        ### return:
+        [new state | error code (<0)]
+        '''
+        self._checkInitialized()
+        return await self._run(self.MCR.IRC.state, state, timeout=timeout)
+
+    async def setMotorSpeed(self, axis:str, speed:int) -> int:
+        return await self._run(self._motor(axis).setMotorSpeed, int(speed))
+
+    async def setRegardLimits(self, state:bool, timeout:float|None=None):
+        self._checkInitialized()
+        def setLimits():
+            self.MCR.focus.setRespectLimits(state)
+            self.MCR.zoom.setRespectLimits(state)
+        await self._run(setLimits, timeout=timeout)
+
+    ##### queries #####
+    async def readPositions(self) -> dict:
+        '''
+        Read the motor steps after all previously awaited commands on this board are finished.
+        ### return:
+        [{'zoom': step, 'focus': step, 'iris': step, 'positionUnknown': bool}]
+        '''
+        self._checkInitialized()
+        def positions():
+            return {axis: getattr(self.MCR, axis).currentStep for axis in AsyncMCRController.axes}
+        result = await self._run(positions)
+        result['positionUnknown'] = self.positionUnknown
+        return result
+
+    async def readBoardInfo(self, timeout:float|None=None) -> tuple[str, str]:
+        '''
+        ### return:
+        [FW revision, board SN]
+        '''
+        self._checkInitialized()
+        def boardInfo():
+            return self.MCR.MCRBoard.readFWRevision(), self.MCR.MCRBoard.readBoardSN()
+        return await self._run(boardInfo, timeout=timeout)
+
+    ##### close #####
+    async def close(self):
+        '''
+        Close the serial port and stop the executor (after the queued commands are finished).
+        '''
+        if self.MCR:
+            await self._run(self.MCR.close)
+            self.MCR = None
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,94 @@
+# Serial command throughput benchmark for Theia_MCR-IQ_GUI
+# Compare sequential (wait for each reply) and pipelined commands using the local serial stand-in
+# or a connected MCR board.
+#
+# usage: python benchmark_pipeline.py [--port com4] [--count 200] [--latency 0.002]
+#
+# v.1.0.0 261019 initial creation
+
+import argparse
+import time
+import statistics
+import command_pipeline as pipe
+from serial_standin import SerialStandIn
+
+# MCR._sendCmd style exchange: wait for data, then readline (poll period 0.1 s)
+def sendSequentialMCR(serialPort, cmd:bytes) -> bytes:
+    serialPort.write(cmd)
+    startTime = time.perf_counter()
+    while time.perf_counter() - startTime < 0.5:
+        if serialPort.in_waiting > 0:
+            return serialPort.readline()
+        time.sleep(0.1)
+    return b''
+
+# the mix of independent commands used in initMCR (limit flag reads, IRC state, board queries)
+def commandMix(count:int) -> list[bytes]:
+    mix = [pipe.readMotorSetupCmd(0x01), pipe.readMotorSetupCmd(0x02), pipe.IRCStateCmd(1), pipe.readFWRevisionCmd(), pipe.readBoardSNCmd()]
+    return [mix[i % len(mix)] for i in range(count)]
+
+def runSequentialMCR(serialPort, commands:list) -> list[float]:
+    latencies = []
+    for cmd in commands:
+        startTime = time.perf_counter()
+        sendSequentialMCR(serialPort, cmd)
+        latencies.append(time.perf_counter() - startTime)
+    return latencies
+
+def runSequentialFramed(serialPort, commands:list) -> list[float]:
+    pipeline = pipe.CommandPipeline(serialPort)
+    latencies = []
+    for cmd in commands:
+        startTime = time.perf_counter()
+        pipeline.queue(cmd)
+        pipeline.flush()
+        latencies.append(time.perf_counter() - startTime)
+    return latencies
+
+def runPipelined(serialPort, commands:list, depth:int) -> list[float]:
+    # latency is measured from the start of the batch to the reply of each command
+    pipeline = pipe.CommandPipeline(serialPort)
+    latencies = []
+    for i in range(0, len(commands), depth):
+        batch = commands[i:i + depth]
+        startTime = time.perf_counter()
+        for cmd in batch:
+            pipeline.queue(cmd)
+        pipeline.flush()
+        latencies.extend(replyTime - startTime for replyTime in pipeline.replyTimes if replyTime is not None)
+    return latencies
+
+def report(name:str, latencies:list, totalTime:float):
+    ms = [l * 1000 for l in latencies]
+    print(f'{name:<24} {len(ms) / totalTime:10.1f} cmd/s   latency mean {statistics.mean(ms):8.2f} ms   median {statistics.median(ms):8.2f} ms   max {max(ms):8.2f} ms')
+
+def main():
+    parser = argparse.ArgumentParser(description='MCR serial command throughput benchmark')
+    parser.add_argument('--port', default='', help='serial port of an MCR board (default: local stand-in)')
+    parser.add_argument('--count', type=int, default=100, help='number of commands for each test')
+    parser.add_argument('--depth', type=int, default=5, help='number of commands in each pipelined batch')
+    parser.add_argument('--latency', type=float, default=0.002, help='(s) stand-in firmware turn around time')
+    args = parser.parse_args()
+
+    if args.port:
+        import serial
+        serialPort = serial.Serial(port=args.port, baudrate=115200, bytesize=8, timeout=0.1, stopbits=serial.STOPBITS_ONE)
+    else:
+        serialPort = SerialStandIn(latency=args.latency)
+    commands = commandMix(args.count)
+
+    tests = [
+        ('sequential (MCR style)', lambda: runSequentialMCR(serialPort, commands)),
+        ('sequential (framed)', lambda: runSequentialFramed(serialPort, commands)),
+        (f'pipelined (depth {args.depth})', lambda: runPipelined(serialPort, commands, args.depth)),
+    ]
+    print(f'{args.count} commands on {args.port if args.port else "local stand-in"}')
+    for name, test in tests:
+        serialPort.reset_input_buffer()
+        startTime = time.perf_counter()
+        latencies = test()
+        report(name, latencies, time.perf_counter() - startTime)
+    serialPort.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+# Pipelined serial commands for the MCR600 series board
+#
+# v.1.0.0 261019 initial creation
+
+import time
+import logging
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+# MCR600 protocol constants (see the TheiaMCR module)
+MCR_IRC_MOTOR_ID = 0x04
+MCR_IRC_SWITCH_TIME = 50                # (steps) IRC switch time
+MCR_IRC_DEFAULT_SPEED = 1000            # (pps) IRC speed
+
+class CommandPipeline:
+    # response lengths for replies that may contain CR (0x0D) data bytes.  All other replies end at the first CR.
+    responseLengths = {0x76: 7, 0x79: 8, 0x67: 12}
+    errorResponse = 0x74                # 3 byte error reply [0x74, 0x01, 0x0D]
+
+    def __init__(self, serialPort, responseTime:float=0.5, drainTime:float=0.2):
+        '''
+        Queue independent MCR commands and send them back-to-back without waiting for each reply.
+        The board executes commands in the order they are received so replies are matched to the queued
+        commands in order and checked against the command byte (the first byte of each reply echoes the command).
+        Only commands that don't depend on a previous reply should be queued together.  Dependent commands
+        (for example read motor setup then write motor setup) are sent in separate flush() calls.
+        Motor moves should not be pipelined except the short IRC switch since the firmware reply only
+        arrives after the move is finished.
+        The serial port is shared with TheiaMCR which reads each reply with readline().  If a reply times out or
+        an unexpected byte is received, the rest of the batch is not read and the serial input is drained so a late
+        reply isn't read by the next TheiaMCR command.  The caller should then use the sequential TheiaMCR functions.
+        ### input:
+        - serialPort: open serial port (MCRControl.serialPort or a SerialStandIn)
+        - responseTime (optional: 0.5): (s) maximum time to wait for each reply after the previous reply
+        - drainTime (optional: 0.2): (s) time to wait for late replies before draining the serial input
+        '''
+        self.serialPort = serialPort
+        self.responseTime = responseTime
+        self.drainTime = drainTime
+        self.pending = []               # [(cmd, waitTime)]
+        self.replyTimes = []            # time.perf_counter() arrival time of each reply of the last flush (None if not received)
+        self.failed = False             # a flush lost a reply (the serial input was drained)
+        self._rxBuffer = bytearray()
+
+    # add a command to the queue
+    def queue(self, cmd:bytes|bytearray, waitTime:float=0) -> int:
+        '''
+        Add a command to the pipeline.
+        ### input:
+        - cmd: command byte string (ending in CR)
+        - waitTime (optional: 0): (s) additional execution time for the command (IRC switching)
+        ### return:
+        [index of the reply in the flush() result]
+        '''
+        self.pending.append((bytes(cmd), waitTime))
+        return len(self.pending) - 1
+
+    # send the queued commands and collect the replies
+    def flush(self) -> list[bytes | None]:
+        '''
+        Send all queued commands in a single write and read the replies as they arrive.
+        ### return:
+        [list of replies in queued order.  None if the reply timed out, was an error reply, or wasn't read]
+        '''
+        self.replyTimes = []
+        if not self.pending:
+            return []
+        pending, self.pending = self.pending, []
+        self.serialPort.write(b''.join(cmd for cmd, _ in pending))
+        replies = []
+        for cmd, waitTime in pending:
+            reply = self._readReply(cmd[0], time.perf_counter() + self.responseTime + waitTime)
+            if reply is None:
+                log.warning(f'No valid reply for command 0x{cmd[0]:02X}')
+                self._drain()
+                break
+            self.replyTimes.append(time.perf_counter())
+            if reply[0] == CommandPipeline.errorResponse:
+                log.warning(f'Error reply for command 0x{cmd[0]:02X}')
+                reply = None
+            replies.append(reply)
+        replies += [None] * (len(pending) - len(replies))
+        self.replyTimes += [None] * (len(pending) - len(self.replyTimes))
+        return replies
+
+    # resynchronize the serial port
+    def _drain(self):
+        '''
+        Wait for late replies and discard all received data.  
+        '''
+        self.failed = True
+        time.sleep(self.drainTime)
+        self.serialPort.reset_input_buffer()
+        self._rxBuffer.clear()
+        log.warning('Serial input drained')
+
+    # read one reply
+    def _readReply(self, code:int, deadline:float) -> bytes | None:
+        '''
+        Read the next reply from the serial port.
+        ### input:
+        - code: command byte that the reply should echo
+        - deadline: time.perf_counter() time to stop waiting
+        ### return:
+        [reply bytes | None if timed out or an unexpected byte was received]
+        '''
+        while True:
+            if self._rxBuffer and self._rxBuffer[0] not in {code, CommandPipeline.errorResponse}:
+                log.warning(f'Unexpected byte 0x{self._rxBuffer[0]:02X} for command 0x{code:02X}')
+                return None
+            if self._rxBuffer:
+                if self._rxBuffer[0] == CommandPipeline.errorResponse:
+                    length = 3
+                else:
+                    length = CommandPipeline.responseLengths.get(code, self._rxBuffer.find(b'\x0D') + 1)
+                if 0 < length <= len(self._rxBuffer):
+                    reply = bytes(self._rxBuffer[:length])
+                    del self._rxBuffer[:length]
+                    return reply
+            if time.perf_counter() >= deadline:
+                return None
+            self._rxBuffer += self.serialPort.read(max(1, self.serialPort.in_waiting))
+
+##### command strings #####
+def readFWRevisionCmd() -> bytes:
+    return bytes([0x76, 0x0D])
+
+def readBoardSNCmd() -> bytes:
+    return bytes([0x79, 0x0D])
+
+def readMotorSetupCmd(motorID:int) -> bytes:
+    return bytes([0x67, motorID, 0x0D])
+
+def writeRegardLimitsCmd(setupReply:bytes, state:bool, PISide:int) -> bytes:
+    '''
+    Create the write motor setup command from the read motor setup reply with the limit switch flags changed.
+    (same format as TheiaMCR motor._regardLimits)
+    ### input:
+    - setupReply: 12 byte reply to readMotorSetupCmd
+    - state: regard limits state
+    - PISide: low (-1) or high (1) side PI step
+    '''
+    cmd = bytearray(12)
+    cmd[:len(setupReply)] = setupReply[:12]
+    cmd[0] = 0x63
+    cmd[3] = 1 if state and PISide == 1 else 0
+    cmd[4] = 1 if state and PISide != 1 else 0
+    return bytes(cmd)
+
+def IRCStateCmd(state:int) -> bytes:
+    '''
+    Create the IRC switch command (same format as TheiaMCR motor.state).
+    ### input:
+    - state: 1 (visible filter) | 2 (clear filter)
+    '''
+    cmd = bytearray(8)
+    cmd[0] = 0x62 if state == 1 else 0x66
+    cmd[1] = MCR_IRC_MOTOR_ID
+    cmd[2:4] = MCR_IRC_SWITCH_TIME.to_bytes(2, 'big')
+    cmd[4] = 1
+    cmd[5:7] = MCR_IRC_DEFAULT_SPEED.to_bytes(2, 'big')
+    cmd[7] = 0x0D
+    return bytes(cmd)
+
+##### pipelined sequences #####
+def readBoardInfo(pipeline:CommandPipeline) -> tuple[str, str]:
+    '''
+    Read the board firmware revision and serial number in one round trip.
+    The strings are formatted the same as TheiaMCR controllerClass.readFWRevision and readBoardSN.
+    ### return:
+    [FW revision ('' if not read), board SN ('' if not read)] (use the TheiaMCR functions if either is '')
+    '''
+    pipeline.queue(readFWRevisionCmd())
+    pipeline.queue(readBoardSNCmd())
+    fwReply, snReply = pipeline.flush()
+    fw = '.'.join(f'{c:x}' for c in fwReply)[3:-2] if fwReply and len(fwReply) == 7 else ''
+    sn = ''
+    if snReply and len(snReply) == 8:
+        sn = f'{snReply[1]:02x}{snReply[2]:02x}'[:-1] + f'-{snReply[-4]:02x}{snReply[-3]:02x}{snReply[-2]:02x}'
+    return fw, sn
+
+def setRegardLimitsAndIRC(pipeline:CommandPipeline, MCR, regardLimits:bool, IRCState:int|None=None) -> bool:
+    '''
+    Set the focus and zoom regard limits flags and (optionally) the IRC state using two round trips instead of five.
+    The first flush reads both motor setups and switches the IRC.  The second flush writes both motor setups.
+    The motor respectLimits variables are set the same as TheiaMCR motor.setRespectLimits after the write is confirmed.
+    ### input:
+    - pipeline: the command pipeline
+    - MCR: the initialized MCRControl instance
+    - regardLimits: regard limits state
+    - IRCState (optional: None): 1 | 2 to set the IRC filter or None
+    ### return:
+    [True if all replies were received and the setups were written] (use the TheiaMCR functions if False)
+    '''
+    motors = [MCR.focus, MCR.zoom]
+    for motor in motors:
+        pipeline.queue(readMotorSetupCmd(motor.motorID))
+    if IRCState is not None:
+        pipeline.queue(IRCStateCmd(IRCState), waitTime=MCR_IRC_SWITCH_TIME / 1000)
+    replies = pipeline.flush()
+    success = all(reply is not None for reply in replies)
+
+    writeMotors = []
+    for motor, setupReply in zip(motors, replies):
+        if setupReply is None or len(setupReply) != 12:
+            log.error(f'Motor 0x{motor.motorID:02X} setup not read, limits not changed')
+            success = False
+            continue
+        pipeline.queue(writeRegardLimitsCmd(setupReply, regardLimits, motor.PISide))
+        writeMotors.append(motor)
+    replies = pipeline.flush()
+    for motor, reply in zip(writeMotors, replies):
+        if reply is not None and reply[1] == 0x00:
+            motor.respectLimits = regardLimits
+        else:
+            log.error(f'Motor 0x{motor.motorID:02X} write motor configuration failed')
+            success = False
+    return success
@@ -0,0 +1,94 @@
+# Table driven event dispatcher for Theia_MCR-IQ_GUI
+#
+# v.1.0.0 261019 initial creation
+
+import time
+import logging
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+class EventDispatcher:
+    def __init__(self):
+        '''
+        Map window event keys to handler functions.  Handlers are called with (event, values).
+        Exact keys are found with one dictionary lookup.  Prefix keys (for example 'zoomCurFld' to catch the bound
+        'zoomCurFldUpdate' event) are resolved once per event key and the result is cached so all later events
+        are also one lookup.  Several handlers can be registered for the same key, they are called in order.
+        The number of calls and the time spent in each handler are recorded.
+        '''
+        self.handlers = {}              # event key: [(name, handler)]
+        self.prefixHandlers = {}        # key prefix: [(name, handler)]
+        self._resolved = {}             # event key: [(name, handler)] cache of prefix matches
+        self.stats = {}                 # handler name: [calls, total time (s), max time (s)]
+
+    # register a handler
+    def register(self, key, handler, prefix:bool=False, name:str=''):
+        '''
+        Register a handler for an event key.
+        ### input:
+        - key: the event key (or key prefix)
+        - handler: function(event, values)
+        - prefix (optional: False): match all string events that start with the key
+        - name (optional: handler function name): name used for the timing statistics
+        '''
+        entry = (name if name else handler.__name__, handler)
+        table = self.prefixHandlers if prefix else self.handlers
+        table.setdefault(key, []).append(entry)
+        self.stats.setdefault(entry[0], [0, 0.0, 0.0])
+        self._resolved.clear()
+        return
+
+    # find the handlers for an event
+    def resolve(self, event) -> list:
+        '''
+        ### return:
+        [list of (name, handler) for the event (empty if not handled)]
+        '''
+        entries = self.handlers.get(event)
+        if entries != None:
+            return entries
+        entries = self._resolved.get(event)
+        if entries == None:
+            # first time this event is seen, check the prefixes (longest prefix first)
+            entries = []
+            if isinstance(event, str):
+                for key in sorted(self.prefixHandlers, key=len, reverse=True):
+                    if event.startswith(key):
+                        entries = self.prefixHandlers[key]
+                        break
+            self._resolved[event] = entries
+        return entries
+
+    # call the handlers
+    def dispatch(self, event, values:dict):
+        '''
+        Call the handlers registered for the event.
+        ### input:
+        - event: the event key
+        - values: the window values
+        ### return:
+        [return value of the last handler | None if the event isn't handled]
+        '''
+        result = None
+        for name, handler in self.resolve(event):
+            startTime = time.perf_counter()
+            try:
+                result = handler(event, values)
+            finally:
+                elapsed = time.perf_counter() - startTime
+                stat = self.stats[name]
+                stat[0] += 1
+                stat[1] += elapsed
+                stat[2] = max(stat[2], elapsed)
+        return result
+
+    # timing statistics
+    def logStats(self):
+        '''
+        Log the call count, mean and maximum time of the handlers that were called (slowest total time first).
+        '''
+        called = [(name, stat) for name, stat in self.stats.items() if stat[0] > 0]
+        for name, (calls, total, maximum) in sorted(called, key=lambda item: item[1][1], reverse=True):
+            log.info(f'{name:<24} calls {calls:6d}   mean {total / calls * 1000:9.2f} ms   max {maximum * 1000:9.2f} ms')
+        return
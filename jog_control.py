@@ -0,0 +1,185 @@
+# Press and hold jog control for Theia_MCR-IQ_GUI
+#
+# v.1.0.0 261019 initial creation
+# v.1.0.1 261019 jog moves run on a worker thread
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+class JogController:
+    # jog events: event key: (axis, direction)
+    # buttons (bound press/release events)
+    buttonEvents = {
+        'jogZoomMinus': ('zoom', -1),       # tele
+        'jogZoomPlus': ('zoom', 1),         # wide
+        'jogFocusMinus': ('focus', -1),     # near
+        'jogFocusPlus': ('focus', 1),       # far
+        'jogIrisMinus': ('iris', -1),       # open
+        'jogIrisPlus': ('iris', 1),         # close
+    }
+    # keyboard (Ctrl + arrow / page keys, bound to the main window)
+    keyEvents = {
+        'Left': ('zoom', -1),
+        'Right': ('zoom', 1),
+        'Down': ('focus', -1),
+        'Up': ('focus', 1),
+        'Prior': ('iris', -1),
+        'Next': ('iris', 1),
+    }
+    # mouse wheel over the current position fields
+    wheelEvents = {
+        'zoomCurFldWheel': 'zoom',
+        'focusCurFldWheel': 'focus',
+        'irisCurFldWheel': 'iris',
+    }
+
+    def __init__(self, period:float=0.1, minSteps:int=1, pollPeriod:float=0.01):
+        '''
+        Stream short relative moves while a jog control is held.  The MCR600 firmware has no velocity (continuous
+        move) command so each period a move of (motor speed * period) steps is sent.
+        TheiaMCR moves block until the board replies so the moves run on a single worker thread (one move at a time)
+        and the main event loop stays responsive.  The loop reads the windows with timeout(), collects the finished
+        move with finishedMove() and calls dueSteps() to send the next move.
+        Stop latency: a release stops new moves right away but the move in progress can't be interrupted.  The
+        worst case is one move (period at the motor speed) plus the TheiaMCR command time (the reply is polled every
+        0.1 s and the readline waits for the 0.1 s serial timeout), about 0.3-0.4 s with the default period.
+        ### input:
+        - period (optional: 0.1): (s) jog move period
+        - minSteps (optional: 1): minimum steps for each jog move
+        - pollPeriod (optional: 0.01): (s) event loop timeout while a move is in progress
+        '''
+        self.period = period
+        self.minSteps = minSteps
+        self.pollPeriod = pollPeriod
+        self.axis = None
+        self.direction = 0
+        self._nextStepTime = 0.0
+        self._move = None               # move in progress (future, axis, start step, steps)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='jog')
+
+    @property
+    def active(self) -> bool:
+        return self.axis != None
+
+    @property
+    def busy(self) -> bool:
+        # a jog move is in progress (or finished and not collected)
+        return self._move != None
+
+    @staticmethod
+    def isJogEvent(event) -> bool:
+        '''
+        ### return:
+        [True for the jog buttons, keys, focus out, and mouse wheel events (events that don't wait for the jog move)]
+        '''
+        return isinstance(event, str) and (event.startswith('jog') or event in JogController.wheelEvents)
+
+    # start jogging
+    def start(self, axis:str, direction:int) -> bool:
+        '''
+        Start jogging an axis.  Repeated start calls for the same axis and direction (keyboard auto repeat) are ignored.
+        ### input:
+        - axis: 'zoom' | 'focus' | 'iris'
+        - direction: -1 | 1
+        ### return:
+        [True if a new jog was started]
+        '''
+        if self.axis == axis and self.direction == direction:
+            return False
+        self.axis = axis
+        self.direction = direction
+        self._nextStepTime = 0.0
+        log.debug(f'Jog {axis} {direction:+d}')
+        return True
+
+    # stop jogging
+    def stop(self) -> bool:
+        '''
+        ### return:
+        [True if a jog was stopped]
+        '''
+        if not self.active:
+            return False
+        log.debug(f'Jog {self.axis} stopped')
+        self.axis = None
+        self.direction = 0
+        return True
+
+    # read timeout for the event loop
+    def timeout(self) -> int | None:
+        '''
+        ### return:
+        [(ms) time until the next jog move or the move poll period | None (wait for events) if not jogging]
+        '''
+        if self.busy:
+            return int(self.pollPeriod * 1000)
+        if not self.active:
+            return None
+        return max(0, int((self._nextStepTime - time.perf_counter()) * 1000))
+
+    # next jog move
+    def dueSteps(self, speed:float) -> int:
+        '''
+        Get the steps for the next jog move if it is due (rate limited to one move per period).
+        ### input:
+        - speed: (pps) current motor speed
+        ### return:
+        [signed steps to move | 0 if no move is due]
+        '''
+        now = time.perf_counter()
+        if not self.active or now < self._nextStepTime:
+            return 0
+        self._nextStepTime = now + self.period
+        return self.direction * max(self.minSteps, int(speed * self.period))
+
+    # send a move
+    def send(self, motor, axis:str, steps:int):
+        '''
+        Start a relative move on the worker thread.  Backlash correction is not used for jog moves since it would
+        reverse the motor every move.
+        ### input:
+        - motor: the TheiaMCR motor
+        - axis: 'zoom' | 'focus' | 'iris'
+        - steps: signed steps
+        '''
+        self._move = (self.executor.submit(motor.moveRel, steps, correctForBL=False), axis, motor.currentStep, steps)
+
+    # collect the finished move
+    def finishedMove(self, wait:bool=False) -> tuple[str, int, int] | None:
+        '''
+        ### input:
+        - wait (optional: False): wait for the move in progress to finish
+        ### return:
+        [(axis, start step, requested steps) of the finished move | None if no move finished]
+        '''
+        if not self.busy:
+            return None
+        future, axis, startStep, steps = self._move
+        if not (wait or future.done()):
+            return None
+        self._move = None
+        try:
+            future.result()
+        except Exception as e:
+            log.error(f'** Jog {axis} move error ({e})')
+        return axis, startStep, steps
+
+    def close(self):
+        self.stop()
+        self.executor.shutdown(wait=True)
+
+    # single wheel step
+    def wheelSteps(self, delta:int, speed:float) -> int:
+        '''
+        Steps for one mouse wheel notch (one jog period move).
+        ### input:
+        - delta: mouse wheel event delta (+ away from the user)
+        - speed: (pps) current motor speed
+        ### return:
+        [signed steps]
+        '''
+        return (1 if delta > 0 else -1) * max(self.minSteps, int(speed * self.period))
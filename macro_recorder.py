@@ -0,0 +1,199 @@
+# Record and replay motor control sessions for Theia_MCR-IQ_GUI
+#
+# v.1.0.0 261019 initial creation
+
+import json
+import logging
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+# macro operations are stored as short lists [kind, axis, value]
+#   ['rel', axis, steps]        relative move (steps the motor actually moved, moves are clipped at the limits)
+#   ['abs', axis, step]         absolute move
+#   ['irc', '', state]          IRC filter state (1 | 2)
+#   ['speed', axis, pps]        motor speed
+#   ['homeSpeed', axis, pps]    motor homing speed
+MOVE_KINDS = {'rel', 'abs'}
+AXES = ('zoom', 'focus', 'iris')
+
+class MacroRecorder:
+    # relative move events: (axis, direction, step field)
+    relativeEvents = {
+        'moveWideBtn': ('zoom', 1, 'zoomStepFld'),
+        'moveTeleBtn': ('zoom', -1, 'zoomStepFld'),
+        'moveFarBtn': ('focus', 1, 'focusStepFld'),
+        'moveNearBtn': ('focus', -1, 'focusStepFld'),
+        'moveCloseBtn': ('iris', 1, 'irisStepFld'),
+        'moveOpenBtn': ('iris', -1, 'irisStepFld'),
+    }
+    # absolute move events: (axis, current position field)
+    absoluteEvents = {
+        'moveZoomAbsBtn': ('zoom', 'zoomCurFld'),
+        'zoomCurFldUpdate': ('zoom', 'zoomCurFld'),
+        'moveFocusAbsBtn': ('focus', 'focusCurFld'),
+        'focusCurFldUpdate': ('focus', 'focusCurFld'),
+        'moveIrisAbsBtn': ('iris', 'irisCurFld'),
+        'irisCurFldUpdate': ('iris', 'irisCurFld'),
+    }
+    IRCEvents = {'IRCBtn1': 1, 'IRCBtn2': 2}
+
+    def __init__(self):
+        '''
+        Record the motion operations from the main window event handlers.  Only the operations are recorded,
+        not the time between them, so the replay runs at full machine speed.
+        '''
+        self.recording = False
+        self.ops = []
+
+    def start(self):
+        self.ops = []
+        self.recording = True
+        log.info('Macro recording started')
+
+    def stop(self) -> list:
+        self.recording = False
+        log.info(f'Macro recording stopped ({len(self.ops)} operations)')
+        return self.ops
+
+    # record an operation
+    def record(self, kind:str, axis:str, value:int):
+        '''
+        Add an operation to the recording (if recording).
+        ### input:
+        - kind: 'rel' | 'abs' | 'irc' | 'speed' | 'homeSpeed'
+        - axis: 'zoom' | 'focus' | 'iris' ('' for IRC)
+        - value: steps, step, state, or speed
+        '''
+        if self.recording:
+            self.ops.append([kind, axis, int(value)])
+
+    # record a finished move
+    def recordMove(self, axis:str, startStep:int, endStep:int, absolute:bool=False):
+        '''
+        Record a move after it is finished using the motor step after the move.  Relative moves are recorded
+        as the steps actually moved since TheiaMCR clips relative moves at the PI and maximum limits, the requested
+        steps may not be the same.  Relative moves that didn't move the motor are not recorded.
+        ### input:
+        - axis: 'zoom' | 'focus' | 'iris'
+        - startStep: motor step before the move
+        - endStep: motor step after the move
+        - absolute (optional: False): record an absolute move to endStep
+        '''
+        if absolute:
+            self.record('abs', axis, endStep)
+        elif endStep != startStep:
+            self.record('rel', axis, endStep - startStep)
+
+##### macro file #####
+def saveMacro(fileName:str, ops:list):
+    '''
+    Save the macro operations (one operation per line).
+    '''
+    with open(fileName, 'w') as f:
+        f.write('[\n' + ',\n'.join(json.dumps(op, separators=(',', ':')) for op in ops) + '\n]\n')
+    log.info(f'Macro saved to {fileName}')
+
+def loadMacro(fileName:str) -> list | None:
+    '''
+    Load and check the macro operations.
+    ### return:
+    [list of operations | None if the file format is not correct]
+    '''
+    try:
+        with open(fileName, 'r') as f:
+            ops = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        log.error(f'** Macro file not read ({e})')
+        return None
+    if not isinstance(ops, list):
+        log.error('** Macro file format error (not a list of operations)')
+        return None
+    for op in ops:
+        if not (isinstance(op, list) and len(op) == 3 and op[0] in MOVE_KINDS | {'irc', 'speed', 'homeSpeed'} \
+                and (op[1] in AXES or op[0] == 'irc') and isinstance(op[2], int)):
+            log.error(f'** Macro file format error {op}')
+            return None
+    return ops
+
+##### replay #####
+def mergeOperations(ops:list) -> list:
+    '''
+    Merge moves so the replay sends fewer commands.  Moves on different motors are independent so within a
+    group of consecutive moves (not separated by IRC or speed changes) the moves for each motor are combined:
+    - relative moves are added together
+    - an absolute move replaces all previous moves of that motor
+    - a relative move after an absolute move changes the absolute target
+    This only gives the same final position because relative moves are recorded as the steps actually moved
+    (see MacroRecorder.recordMove), a requested move that was clipped at a limit can't be added.
+    Consecutive speed changes for the same motor keep only the last value.
+    ### input:
+    - ops: list of recorded operations
+    ### return:
+    [merged list of operations]
+    '''
+    merged = []
+    moveGroup = {}                  # axis: [kind, axis, value] in first move order
+    def closeGroup():
+        merged.extend(op for op in moveGroup.values() if not (op[0] == 'rel' and op[2] == 0))
+        moveGroup.clear()
+
+    for kind, axis, value in ops:
+        if kind in MOVE_KINDS:
+            last = moveGroup.get(axis)
+            if kind == 'abs' or last == None:
+                moveGroup.pop(axis, None)
+                moveGroup[axis] = [kind, axis, value]
+            else:
+                last[2] += value
+        else:
+            closeGroup()
+            if merged and kind in {'speed', 'homeSpeed'} and merged[-1][0] == kind and merged[-1][1] == axis:
+                merged[-1][2] = value
+            else:
+                merged.append([kind, axis, value])
+    closeGroup()
+    return merged
+
+class MacroReplayer:
+    def __init__(self, MCR, regardBacklash:bool=True, afterOperation=None):
+        '''
+        Replay macro operations without any wait time between them.  Absolute moves to the current motor step
+        are skipped (moveAbs homes the motor first).
+        ### input:
+        - MCR: the initialized MCRControl instance
+        - regardBacklash (optional: True): backlash correction for relative moves
+        - afterOperation (optional: None): callback function(kind, axis, value) called after each operation (update GUI fields)
+        '''
+        self.MCR = MCR
+        self.regardBacklash = regardBacklash
+        self.afterOperation = afterOperation
+
+    def run(self, ops:list, merge:bool=True) -> int:
+        '''
+        Run the macro.
+        ### input:
+        - ops: list of operations
+        - merge (optional: True): merge adjacent moves before running
+        ### return:
+        [number of operations run]
+        '''
+        if merge:
+            ops = mergeOperations(ops)
+        for kind, axis, value in ops:
+            if kind == 'rel':
+                # iris relative moves don't use backlash correction (same as the main window)
+                getattr(self.MCR, axis).moveRel(value, correctForBL=self.regardBacklash and axis != 'iris')
+            elif kind == 'abs':
+                if getattr(self.MCR, axis).currentStep == value:
+                    continue
+                getattr(self.MCR, axis).moveAbs(value)
+            elif kind == 'irc':
+                self.MCR.IRC.state(value)
+            elif kind == 'speed':
+                getattr(self.MCR, axis).setMotorSpeed(value)
+            elif kind == 'homeSpeed':
+                getattr(self.MCR, axis).setHomingSpeed(value)
+            if self.afterOperation: self.afterOperation(kind, axis, value)
+        log.info(f'Macro replay finished ({len(ops)} operations)')
+        return len(ops)
@@ -0,0 +1,117 @@
+# Shared memory motor position feed for Theia_MCR-IQ_GUI
+#
+# v.1.0.0 261019 initial creation
+# v.1.0.1 261019 readers don't register the block with the resource tracker (POSIX)
+
+from multiprocessing import shared_memory, resource_tracker
+import os
+import sys
+import struct
+import time
+import logging
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+class PositionFeed:
+    # shared memory record layout (little endian, fixed size)
+    # [sequence (uint64), timestamp (float64, time.time()), zoom step, focus step, iris step, status code (int32)]
+    recordFormat = '<Qd4i'
+    recordSize = struct.calcsize(recordFormat)
+    defaultName = 'TheiaMCRPositions'
+
+    # status codes published in the record (GUIActions.controllerStatusList keys)
+    statusCodes = {
+        'notInit': 0,
+        'init': 1,
+        'ready': 2,
+        'moving': 3,
+        'posUnknown': 4,
+        'error': 5,
+    }
+
+    def __init__(self, name:str=defaultName, create:bool=False):
+        '''
+        Publish (or read) the current motor positions in a shared memory block so other processes can
+        read them without serial traffic or GUI access.
+        The GUI application is the only writer (create=True).  Readers attach to the existing block by name.
+        The record is protected by a sequence counter (seqlock): the writer sets the counter to an odd value
+        while writing and to the next even value when the record is complete.  Readers retry if the counter
+        is odd or changed during the read.  No locks are used so a reader can't block the GUI.
+        ### input:
+        - name (optional: 'TheiaMCRPositions'): shared memory block name
+        - create (optional: False): set True to create the block (writer), False to attach to an existing block (reader)
+        '''
+        self.name = name
+        self.isWriter = create
+        self.sequence = 0
+        if create:
+            try:
+                self.shm = shared_memory.SharedMemory(name=name, create=True, size=PositionFeed.recordSize)
+            except FileExistsError:
+                # left over from a previous session, reuse it
+                log.info(f'Shared memory {name} already exists, attaching')
+                self.shm = shared_memory.SharedMemory(name=name)
+                self.sequence = struct.unpack_from('<Q', self.shm.buf, 0)[0] & ~1
+            self.publish(0, 0, 0, 'notInit')
+        elif sys.version_info >= (3, 13):
+            self.shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            if os.name == 'posix':
+                # the reader's resource tracker would unlink the block when the reader exits
+                resource_tracker.unregister(self.shm._name, 'shared_memory')
+        # zero copy view of the record for readers
+        self.buffer = self.shm.buf[:PositionFeed.recordSize]
+
+    # publish the positions
+    def publish(self, zoomStep:int, focusStep:int, irisStep:int, status:str):
+        '''
+        Write a new position record.  This is only called by the writer (GUI) process.
+        ### input:
+        - zoomStep, focusStep, irisStep: current motor steps
+        - status: controller status (see statusCodes)
+        '''
+        # mark the record as being written (odd sequence)
+        self.sequence += 1
+        struct.pack_into('<Q', self.shm.buf, 0, self.sequence)
+        struct.pack_into('<d4i', self.shm.buf, 8, time.time(), int(zoomStep), int(focusStep), int(irisStep), PositionFeed.statusCodes.get(status, -1))
+        # record complete (even sequence)
+        self.sequence += 1
+        struct.pack_into('<Q', self.shm.buf, 0, self.sequence)
+        return
+
+    # read the positions
+    def read(self, retries:int=100) -> dict | None:
+        '''
+        Read a consistent copy of the position record.
+        ### input:
+        - retries (optional: 100): number of attempts if the writer is updating the record
+        ### return:
+        [{'sequence', 'timestamp', 'zoom', 'focus', 'iris', 'status'} | None if no consistent record could be read]
+        '''
+        for _ in range(retries):
+            sequence, timestamp, zoom, focus, iris, status = struct.unpack_from(PositionFeed.recordFormat, self.buffer, 0)
+            if sequence & 1:
+                # writer is updating
+                continue
+            if struct.unpack_from('<Q', self.buffer, 0)[0] != sequence:
+                # record changed during the read
+                continue
+            return {'sequence': sequence, 'timestamp': timestamp, 'zoom': zoom, 'focus': focus, 'iris': iris, 'status': status}
+        log.warning('Position feed record was not stable')
+        return None
+
+    # close the shared memory
+    def close(self):
+        '''
+        Release the shared memory.  The writer also removes (unlinks) the block.
+        '''
+        self.buffer.release()
+        self.shm.close()
+        if self.isWriter:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+        return
@@ -0,0 +1,95 @@
+# Named zoom/focus/iris position presets for Theia_MCR-IQ_GUI
+#
+# v.1.0.0 261019 initial creation
+
+import logging
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+class PositionPresets:
+    # recall order: zoom first since the focus step for a sharp image depends on the zoom position, iris is independent
+    recallAxes = ('zoom', 'focus', 'iris')
+
+    def __init__(self, settings):
+        '''
+        Store named motor positions in the settings file.  Presets are indexed by lens family and control board
+        serial number since step positions are only valid for the lens on a particular board.
+        Settings format: settings['presets'] = {'<lens family>|<board SN>': {'<name>': {'zoom': step, 'focus': step, 'iris': step}}}
+        ### input:
+        - settings: the settings (sg.UserSettings) object
+        '''
+        self.settings = settings
+
+    # preset group key
+    @staticmethod
+    def groupKey(lensFamily:str, boardSN:str) -> str:
+        return f'{lensFamily}|{boardSN}'
+
+    def _group(self, lensFamily:str, boardSN:str) -> dict:
+        return self.settings.get('presets', {}).get(PositionPresets.groupKey(lensFamily, boardSN), {})
+
+    # list of preset names
+    def names(self, lensFamily:str, boardSN:str) -> list:
+        '''
+        ### return:
+        [sorted list of preset names for the lens and board]
+        '''
+        return sorted(self._group(lensFamily, boardSN).keys())
+
+    # get a preset
+    def get(self, lensFamily:str, boardSN:str, name:str) -> dict | None:
+        '''
+        ### return:
+        [{'zoom': step, 'focus': step, 'iris': step} | None if the preset doesn't exist]
+        '''
+        return self._group(lensFamily, boardSN).get(name)
+
+    # save a preset
+    def save(self, lensFamily:str, boardSN:str, name:str, zoomStep:int, focusStep:int, irisStep:int):
+        '''
+        Save (or replace) a preset.  The settings file is updated.
+        ### input:
+        - lensFamily: lens family name
+        - boardSN: control board serial number
+        - name: preset name
+        - zoomStep, focusStep, irisStep: motor step positions
+        '''
+        presets = self.settings.get('presets', {})
+        group = presets.setdefault(PositionPresets.groupKey(lensFamily, boardSN), {})
+        group[name] = {'zoom': int(zoomStep), 'focus': int(focusStep), 'iris': int(irisStep)}
+        # assign the dictionary to trigger the settings file autosave
+        self.settings['presets'] = presets
+        log.info(f'Preset "{name}" saved {group[name]}')
+        return
+
+    # delete a preset
+    def delete(self, lensFamily:str, boardSN:str, name:str) -> bool:
+        '''
+        ### return:
+        [True if the preset was deleted]
+        '''
+        presets = self.settings.get('presets', {})
+        group = presets.get(PositionPresets.groupKey(lensFamily, boardSN), {})
+        if name not in group:
+            return False
+        del group[name]
+        self.settings['presets'] = presets
+        log.info(f'Preset "{name}" deleted')
+        return True
+
+    # order of moves to recall a preset
+    @staticmethod
+    def recallOrder(preset:dict, currentSteps:dict) -> list[tuple[str, int]]:
+        '''
+        List the absolute moves needed to recall a preset.
+        Each absolute move homes the motor at the PI and approaches the target from the PI side so backlash
+        reversals only depend on the target.  Time is saved by skipping axes that are already at the target.
+        Zoom is moved before focus since focus is set relative to the zoom position and iris is last.
+        ### input:
+        - preset: {'zoom': step, 'focus': step, 'iris': step}
+        - currentSteps: {'zoom': step, 'focus': step, 'iris': step}
+        ### return:
+        [[(axis, target step)] in move order]
+        '''
+        return [(axis, preset[axis]) for axis in PositionPresets.recallAxes if preset[axis] != currentSteps.get(axis)]
@@ -0,0 +1,80 @@
+# Motor position telemetry ring buffer for Theia_MCR-IQ_GUI
+#
+# v.1.0.0 261019 initial creation
+
+import time
+import numpy as np
+import logging
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+class TelemetryRingBuffer:
+    recordType = np.dtype([('time', 'f8'), ('axis', 'u1'), ('target', 'i4'), ('reached', 'i4')])
+    axisCodes = {'zoom': 0, 'focus': 1, 'iris': 2}
+    axisNames = ('zoom', 'focus', 'iris')
+
+    def __init__(self, capacity:int=100000):
+        '''
+        Fixed capacity record of every motor move (time, axis, target step, reached step).
+        When the buffer is full the oldest records are overwritten.  Records are numbered with a sequence number
+        (total records written) so a reader can ask for only the records since its last read.
+        ### input:
+        - capacity (optional: 100000): number of records kept
+        '''
+        self.capacity = capacity
+        self.data = np.zeros(capacity, dtype=TelemetryRingBuffer.recordType)
+        self.count = 0                  # total number of records written (sequence number of the next record)
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    # add a record
+    def append(self, axis:str, target:int, reached:int, timestamp:float|None=None):
+        '''
+        Add a move record.
+        ### input:
+        - axis: 'zoom' | 'focus' | 'iris'
+        - target: requested step
+        - reached: motor step after the move
+        - timestamp (optional: now): time.time() of the move
+        '''
+        self.data[self.count % self.capacity] = (time.time() if timestamp == None else timestamp, TelemetryRingBuffer.axisCodes[axis], target, reached)
+        self.count += 1
+        return
+
+    # get records in time order
+    def records(self, start:int=0) -> tuple[np.ndarray, int]:
+        '''
+        Get the records with sequence number >= start (oldest first).  If some of these records were already
+        overwritten, the records start at the oldest record available.
+        ### input:
+        - start (optional: 0): first sequence number
+        ### return:
+        [record array (copy), sequence number of the next record]
+        '''
+        start = max(start, self.count - self.capacity, 0)
+        if start >= self.count:
+            return self.data[:0].copy(), self.count
+        first = start % self.capacity
+        last = self.count % self.capacity
+        if first < last:
+            records = self.data[first:last].copy()
+        else:
+            records = np.concatenate((self.data[first:], self.data[:last]))
+        return records, self.count
+
+    # export
+    def exportNpy(self, fileName:str):
+        '''
+        Save the records (oldest first) as a NumPy structured array file.
+        '''
+        np.save(fileName, self.records()[0])
+        log.info(f'Telemetry saved to {fileName}')
+
+    def exportCSV(self, fileName:str):
+        '''
+        Save the records (oldest first) as a CSV file.  Axis codes: 0 zoom, 1 focus, 2 iris.
+        '''
+        np.savetxt(fileName, self.records()[0], delimiter=',', fmt=['%.6f', '%d', '%d', '%d'], header='time,axis,target,reached', comments='')
+        log.info(f'Telemetry saved to {fileName}')
@@ -0,0 +1,253 @@
+# Capture synchronized lens position scan for Theia_MCR-IQ_GUI
+#
+# v.1.0.0 261019 initial creation
+# v.1.0.1 261019 skip the capture if a move fails, capture with the motor steps after the move
+# v.1.0.2 261019 capture errors mark the point failed, the report is always logged
+
+import time
+import json
+import socket
+import socketserver
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+from position_presets import PositionPresets
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+##### capture triggers #####
+# A trigger has a capture(index, point) function that returns when the image is captured (the lens can move).
+# point is the motor steps after the move {'zoom': step, 'focus': step, 'iris': step}.
+# The return value is passed to the processing function.
+
+class CallbackTrigger:
+    def __init__(self, captureFunction):
+        '''
+        Python function trigger.
+        ### input:
+        - captureFunction: function(index, point) called at each scan point, returns the capture result
+        '''
+        self.captureFunction = captureFunction
+
+    def capture(self, index:int, point:dict):
+        return self.captureFunction(index, point)
+
+class SocketTrigger:
+    def __init__(self, host:str='127.0.0.1', port:int=5025, timeout:float=10.0):
+        '''
+        Local socket trigger.  A JSON line {"index": n, "zoom": step, "focus": step, "iris": step} is sent for each
+        point and the capture software replies with one line when the image is captured.
+        ### input:
+        - host (optional: '127.0.0.1'), port (optional: 5025): capture software address
+        - timeout (optional: 10): (s) maximum time to wait for the reply
+        '''
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.reader = self.sock.makefile('r')
+
+    def capture(self, index:int, point:dict) -> str:
+        self.sock.sendall((json.dumps({'index': index, **point}) + '\n').encode())
+        reply = self.reader.readline()
+        if reply == '':
+            raise ConnectionError('Capture socket closed')
+        return reply.strip()
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+class SubprocessTrigger:
+    def __init__(self, command:list, timeout:float=30.0):
+        '''
+        Run a capture program for each point.  The command arguments are formatted with the point values,
+        for example ['capture.exe', '--out', 'img_{index:03d}_z{zoom}_f{focus}.png'].
+        ### input:
+        - command: program and arguments
+        - timeout (optional: 30): (s) maximum program run time
+        '''
+        self.command = command
+        self.timeout = timeout
+
+    def capture(self, index:int, point:dict) -> str:
+        args = [arg.format(index=index, **point) for arg in self.command]
+        result = subprocess.run(args, capture_output=True, text=True, timeout=self.timeout, check=True)
+        return result.stdout.strip()
+
+##### local stand-in #####
+class StandInTrigger:
+    def __init__(self, exposureTime:float=0.02):
+        '''
+        Local stand-in for a camera (testing without capture software).  Each capture takes exposureTime.
+        '''
+        self.exposureTime = exposureTime
+        self.captures = []
+
+    def capture(self, index:int, point:dict) -> dict:
+        time.sleep(self.exposureTime)
+        self.captures.append((index, dict(point)))
+        return {'index': index, **point}
+
+class StandInCaptureServer:
+    def __init__(self, host:str='127.0.0.1', port:int=0, exposureTime:float=0.02):
+        '''
+        Local stand-in capture software for the SocketTrigger.  Replies 'captured <index>' after exposureTime.
+        ### input:
+        - host (optional: '127.0.0.1')
+        - port (optional: 0 = any free port, see self.port)
+        - exposureTime (optional: 0.02): (s) simulated capture time
+        '''
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(handler):
+                for line in handler.rfile:
+                    request = json.loads(line)
+                    time.sleep(exposureTime)
+                    handler.wfile.write(f'captured {request["index"]}\n'.encode())
+
+        self.server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.host, self.port = self.server.server_address
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+##### scan #####
+class ScanPipeline:
+    stages = ('move', 'settle', 'capture', 'process')
+
+    def __init__(self, MCR, trigger, processor=None, settleTime:float=0.05, maxPending:int=2, afterMove=None, stopOnError:bool=False):
+        '''
+        Move the lens through a list of positions and capture an image at each position.
+        For each point: move (absolute moves of the motors that change) -> settle -> capture.  Processing of
+        the capture result runs in a background thread while the lens moves to the next point.  The capture is
+        never overlapped with a move since the image would be blurred.  If processing is slower than moving,
+        the scan waits when maxPending results are being processed.
+        The trigger and processor get the motor steps read after the move (not the requested point).  If a move
+        fails the point is marked failed and not captured.  If the capture raises an error (socket, subprocess, or
+        callback) the point is marked failed.  The scan continues with the next point or stops (stopOnError).
+        This is a library module (no main window control).  In the GUI application pass updateAfterMove as
+        afterMove so the position fields, position history, and position feed are updated.
+        ### input:
+        - MCR: the initialized MCRControl instance (motors homed)
+        - trigger: capture trigger (CallbackTrigger, SocketTrigger, SubprocessTrigger, StandInTrigger)
+        - processor (optional: None): function(index, point, captureResult) run in the background
+        - settleTime (optional: 0.05): (s) wait after the move before the capture
+        - maxPending (optional: 2): maximum number of captures being processed
+        - afterMove (optional: None): function(axis, target) called after each motor move (update GUI fields)
+        - stopOnError (optional: False): stop the scan if a move or capture fails
+        '''
+        self.MCR = MCR
+        self.trigger = trigger
+        self.processor = processor
+        self.settleTime = settleTime
+        self.maxPending = maxPending
+        self.afterMove = afterMove
+        self.stopOnError = stopOnError
+        self.timings = []
+
+    def _currentSteps(self) -> dict:
+        return {axis: getattr(self.MCR, axis).currentStep for axis in PositionPresets.recallAxes}
+
+    def _move(self, point:dict) -> bool:
+        '''
+        Move the motors that are not at the point.
+        ### return:
+        [True if all moves succeeded]
+        '''
+        currentSteps = self._currentSteps()
+        target = {axis: point.get(axis, currentSteps[axis]) for axis in PositionPresets.recallAxes}
+        for axis, step in PositionPresets.recallOrder(target, currentSteps):
+            error = getattr(self.MCR, axis).moveAbs(step)
+            if self.afterMove: self.afterMove(axis, step)
+            if error != 0:
+                log.error(f'** Scan move {axis} to {step} failed ({error})')
+                return False
+        return True
+
+    def _process(self, index:int, point:dict, result, timing:dict):
+        startTime = time.perf_counter()
+        try:
+            self.processor(index, point, result)
+        except Exception as e:
+            log.error(f'** Scan point {index} processing error ({e})')
+        timing['process'] = time.perf_counter() - startTime
+
+    # run the scan
+    def run(self, points:list) -> list[dict]:
+        '''
+        Run the scan.
+        ### input:
+        - points: list of {'zoom': step, 'focus': step, 'iris': step} (missing axes are not moved)
+        ### return:
+        [per point timing list [{'index', 'move', 'settle', 'capture', 'process'} (s), 'position': motor steps, 'failed': bool, 'error': failure description]]
+        '''
+        self.timings = []
+        pending = []
+        try:
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix='scanProcess') as executor:
+                for index, point in enumerate(points):
+                    timing = {'index': index, 'move': 0.0, 'settle': 0.0, 'capture': 0.0, 'process': 0.0, 'failed': False, 'error': ''}
+                    self.timings.append(timing)
+
+                    startTime = time.perf_counter()
+                    success = self._move(point)
+                    timing['move'] = time.perf_counter() - startTime
+                    position = self._currentSteps()
+                    timing['position'] = position
+                    if not success:
+                        timing['failed'] = True
+                        timing['error'] = 'move failed'
+                        log.error(f'** Scan point {index} not captured')
+                        if self.stopOnError: break
+                        continue
+
+                    startTime = time.perf_counter()
+                    time.sleep(self.settleTime)
+                    timing['settle'] = time.perf_counter() - startTime
+
+                    # wait for processing to catch up before the next capture
+                    pending = [future for future in pending if not future.done()]
+                    while len(pending) >= self.maxPending:
+                        pending.pop(0).result()
+
+                    startTime = time.perf_counter()
+                    try:
+                        result = self.trigger.capture(index, position)
+                    except Exception as e:
+                        # socket, subprocess, or callback errors
+                        timing['capture'] = time.perf_counter() - startTime
+                        timing['failed'] = True
+                        timing['error'] = f'capture failed ({e})'
+                        log.error(f'** Scan point {index} capture failed ({e})')
+                        if self.stopOnError: break
+                        continue
+                    timing['capture'] = time.perf_counter() - startTime
+
+                    if self.processor:
+                        pending.append(executor.submit(self._process, index, position, result, timing))
+        finally:
+            self.logReport()
+        return self.timings
+
+    # timing report
+    def logReport(self) -> str:
+        '''
+        Log the mean and maximum time of each stage.
+        ### return:
+        [the slowest stage name (highest total time)]
+        '''
+        if not self.timings:
+            return ''
+        totals = {}
+        for stage in ScanPipeline.stages:
+            times = [timing[stage] for timing in self.timings]
+            totals[stage] = sum(times)
+            log.info(f'{stage:<8} mean {totals[stage] / len(times) * 1000:9.1f} ms   max {max(times) * 1000:9.1f} ms')
+        slowest = max(totals, key=totals.get)
+        failed = sum(timing['failed'] for timing in self.timings)
+        log.info(f'Scan {len(self.timings)} points ({failed} failed), slowest stage: {slowest}')
+        return slowest
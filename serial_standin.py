@@ -0,0 +1,122 @@
+# Local serial port stand-in for the MCR600 series board
+#
+# v.1.0.0 261019 initial creation
+
+import time
+import collections
+
+class SerialStandIn:
+    # simulated firmware replies (without the command byte and CR)
+    FWRevision = bytes([0x05, 0x03, 0x01, 0x00, 0x00])          # 7 byte response
+    boardSN = bytes([0x05, 0x50, 0x00, 0x12, 0x34, 0x00])       # 8 byte response
+    motorSetup = bytes([0x00, 0x01, 0x00, 0x23, 0x28, 0x00, 0x64, 0x05, 0xDC])   # 12 byte response
+    commandLengths = {0x62: 8, 0x66: 8, 0x73: 8, 0x63: 12}                      # fixed length commands
+
+    def __init__(self, latency:float=0.002, byteTime:float=1/11520, stepRate:float=0):
+        '''
+        Serial port replacement that answers MCR600 commands locally.  This is used for benchmarks and testing
+        without a control board.  It supports the subset of the pyserial Serial interface that the TheiaMCR
+        module and this application use (write, read, readline, in_waiting, reset_input_buffer, close).
+        The board processes one command at a time so each reply is available 'latency' seconds after the
+        previous command finished.
+        ### input:
+        - latency (optional: 0.002): (s) firmware turn around time for each command
+        - byteTime (optional: 115200 baud): (s) transfer time for each byte
+        - stepRate (optional: 0): (pps) simulated motor speed for move commands.  0 = moves are instantaneous
+        '''
+        self.latency = latency
+        self.byteTime = byteTime
+        self.stepRate = stepRate
+        self.timeout = 0.1
+        self.is_open = True
+        self.commandCount = 0
+        self._replies = collections.deque()         # (ready time, reply bytes)
+        self._rxBuffer = bytearray()
+        self._busyUntil = 0.0
+
+    # build the reply to a command
+    def _reply(self, cmd:bytes) -> tuple[bytes, float]:
+        '''
+        Create the firmware reply for a command and the time the board is busy executing it.
+        ### input:
+        - cmd: command bytes
+        ### return:
+        [reply bytes, (s) execution time]
+        '''
+        code = cmd[0]
+        execTime = 0.0
+        if code == 0x76:
+            reply = bytes([code]) + SerialStandIn.FWRevision + b'\x0D'
+        elif code == 0x79:
+            reply = bytes([code]) + SerialStandIn.boardSN + b'\x0D'
+        elif code == 0x67:
+            reply = bytes([code, cmd[1]]) + SerialStandIn.motorSetup + b'\x0D'
+        elif code in {0x62, 0x66, 0x73} and len(cmd) >= 8:
+            # motor move
+            steps = int.from_bytes(cmd[2:4], 'big')
+            if self.stepRate > 0:
+                execTime = steps / self.stepRate
+            reply = bytes([code, 0x00, 0x0D])
+        else:
+            reply = bytes([code, 0x00, 0x0D])
+        return reply, execTime
+
+    # pyserial interface
+    def write(self, data:bytes) -> int:
+        '''
+        Accept one or more commands.  Commands end with CR.  Move (8 byte) and motor setup (12 byte) commands
+        have a fixed length because the data bytes may contain CR.
+        '''
+        data = bytes(data)
+        written = len(data)
+        now = time.perf_counter()
+        while data:
+            length = SerialStandIn.commandLengths.get(data[0], data.find(b'\x0D') + 1)
+            if length <= 0: length = len(data)
+            cmd, data = data[:length], data[length:]
+            reply, execTime = self._reply(cmd)
+            start = max(now + len(cmd) * self.byteTime, self._busyUntil)
+            self._busyUntil = start + self.latency + execTime
+            self._replies.append((self._busyUntil + len(reply) * self.byteTime, reply))
+            self.commandCount += 1
+        return written
+
+    def _collect(self):
+        # move replies that are ready into the receive buffer
+        now = time.perf_counter()
+        while self._replies and self._replies[0][0] <= now:
+            self._rxBuffer += self._replies.popleft()[1]
+
+    @property
+    def in_waiting(self) -> int:
+        self._collect()
+        return len(self._rxBuffer)
+
+    def read(self, size:int=1) -> bytes:
+        deadline = time.perf_counter() + self.timeout
+        while True:
+            self._collect()
+            if len(self._rxBuffer) >= size or time.perf_counter() >= deadline:
+                break
+            nextReady = self._replies[0][0] if self._replies else deadline
+            time.sleep(max(0, min(nextReady, deadline) - time.perf_counter()))
+        data = bytes(self._rxBuffer[:size])
+        del self._rxBuffer[:size]
+        return data
+
+    def readline(self) -> bytes:
+        # pyserial readline waits for LF, which the board never sends, so it returns on timeout
+        deadline = time.perf_counter() + self.timeout
+        while time.perf_counter() < deadline:
+            time.sleep(max(0, deadline - time.perf_counter()))
+        self._collect()
+        data = bytes(self._rxBuffer)
+        self._rxBuffer.clear()
+        return data
+
+    def reset_input_buffer(self):
+        self._collect()
+        self._rxBuffer.clear()
+
+    def close(self):
+        self.is_open = False
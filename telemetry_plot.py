@@ -0,0 +1,100 @@
+# Live motor position plot window for Theia_MCR-IQ_GUI
+#
+# v.1.0.0 261019 initial creation
+
+from PSG_license import PySimpleGUI_License
+import PySimpleGUI as sg
+import collections
+import logging
+
+from position_telemetry import TelemetryRingBuffer
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.INFO)
+
+class TelemetryPlot:
+    graphSize = (600, 120)          # (pixels) size of each axis graph
+    targetColor = '#3366CC'
+    reachedColor = '#006633'
+    errorColor = 'red'
+
+    def __init__(self, telemetry:TelemetryRingBuffer, axisRanges:dict, moves:int=200):
+        '''
+        Non-blocking window with a graph for each motor showing the target and reached step of the last moves.
+        The window is read by the main window event loop (sg.read_all_windows).
+        The plot is drawn incrementally: update() only draws the records added since the last update and scrolls
+        the graph when it is full.  Figures that scroll out of the graph are deleted.
+        ### input:
+        - telemetry: the telemetry ring buffer
+        - axisRanges: {'zoom': max step, 'focus': max step, 'iris': max step} for the graph y scale
+        - moves (optional: 200): number of moves shown in each graph
+        '''
+        self.telemetry = telemetry
+        self.moves = moves
+        self.nextRecord = 0
+        self.axisCount = {axis: 0 for axis in TelemetryRingBuffer.axisNames}          # number of moves plotted for each axis
+        self.xShift = {axis: 0 for axis in TelemetryRingBuffer.axisNames}             # graph scroll position
+        self.lastPoint = {axis: None for axis in TelemetryRingBuffer.axisNames}       # last reached point
+        self.figures = {axis: collections.deque() for axis in TelemetryRingBuffer.axisNames}   # (x, [figure ids])
+
+        layout = []
+        for axis in TelemetryRingBuffer.axisNames:
+            maxStep = max(1, axisRanges.get(axis, 1))
+            margin = maxStep * 0.05
+            layout.append([sg.Text(axis.capitalize(), size=(6,1)),
+                sg.Graph(TelemetryPlot.graphSize, (0, -margin), (moves, maxStep + margin), background_color='white', key=f'telemetry_{axis}')])
+        layout.append([sg.Text('target', text_color=TelemetryPlot.targetColor), sg.Text('reached', text_color=TelemetryPlot.reachedColor),
+            sg.Text('missed target', text_color=TelemetryPlot.errorColor), sg.Push(),
+            sg.Button('Export .npy', key='telemetryExportNpy'), sg.Button('Export CSV', key='telemetryExportCSV')])
+        self.window = sg.Window('Motor position history', layout, finalize=True)
+        self.update()
+
+    # draw the new records
+    def update(self):
+        '''
+        Draw the records added since the last update.
+        '''
+        records, self.nextRecord = self.telemetry.records(self.nextRecord)
+        for record in records:
+            axis = TelemetryRingBuffer.axisNames[record['axis']]
+            graph = self.window[f'telemetry_{axis}']
+            x = self.axisCount[axis]
+            self.axisCount[axis] += 1
+            if x - self.xShift[axis] >= self.moves:
+                self._scroll(axis, graph, x - self.xShift[axis] - self.moves + self.moves // 4)
+            gx = x - self.xShift[axis]
+            target, reached = int(record['target']), int(record['reached'])
+            figureIDs = []
+            if self.lastPoint[axis] != None:
+                figureIDs.append(graph.draw_line((gx - 1, self.lastPoint[axis]), (gx, reached), color=TelemetryPlot.reachedColor))
+            figureIDs.append(graph.draw_point((gx, target), size=3, color=TelemetryPlot.targetColor if target == reached else TelemetryPlot.errorColor))
+            self.lastPoint[axis] = reached
+            self.figures[axis].append((x, figureIDs))
+        return
+
+    def _scroll(self, axis:str, graph, shift:int):
+        # move the existing figures left and delete the figures that are off the graph
+        self.xShift[axis] += shift
+        graph.move(-shift, 0)
+        while self.figures[axis] and self.figures[axis][0][0] < self.xShift[axis]:
+            for figureID in self.figures[axis].popleft()[1]:
+                graph.delete_figure(figureID)
+
+    # export the telemetry
+    def export(self, fileType:str):
+        '''
+        Ask for a file name and export the telemetry.
+        ### input:
+        - fileType: 'npy' | 'csv'
+        '''
+        fileName = sg.popup_get_file('Export position history', save_as=True, default_extension=f'.{fileType}',
+            file_types=((fileType.upper(), f'*.{fileType}'),), no_window=True)
+        if not fileName:
+            return
+        if fileType == 'npy':
+            self.telemetry.exportNpy(fileName)
+        else:
+            self.telemetry.exportCSV(fileName)
+
+    def close(self):
+        self.window.close()